@@ -0,0 +1,184 @@
+"""
+Monte Carlo balance simulator of role compositions and voting behaviors
+
+Plays rounds the way Game does, deal, one vote per player and the most
+voted players revealed, as NumPy arrays and reports win rates per game
+type and lobby size:
+
+    python benchmarks/balance.py --types classic jester --sizes 6 8 10 --rounds 1000000
+    python benchmarks/balance.py --behavior herd --herd 0.6 --workers 4 --json balance.json
+
+Town wins a round when a mafia player is among the most voted, mafia
+wins otherwise and a neutral wins when they are among the most voted.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    import numpy as np
+except ImportError:
+    sys.exit("The balance simulator needs numpy: pip install numpy")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakediscord  # noqa: E402
+
+fakediscord.install()
+
+from mafia.composition import CompositionPlanner  # noqa: E402
+
+BEHAVIORS = ("random", "informed", "herd")
+# Rounds simulated per array, bounds memory to a few arrays of CHUNK x players
+CHUNK = 250000
+
+
+def alignments(planner, game_type, size):
+    return np.array([role_class.alignment for role_class in planner.template(game_type, size)], dtype=np.int8)
+
+
+def simulate(template, rounds, behavior, accuracy, herd, turnout, seed):
+    """
+    Outcome counts of `rounds` rounds of one role template
+    """
+    rng = np.random.default_rng(seed)
+    size = len(template)
+    totals = {"rounds": 0, "town": 0, "mafia": 0, "neutral": 0, "ties": 0, "votes": 0, "correct": 0}
+
+    for start in range(0, rounds, CHUNK):
+        count = min(CHUNK, rounds - start)
+        rows = np.arange(count)[:, None]
+
+        # Deal: every row is a shuffled copy of the template, seat -> alignment
+        seats = rng.permuted(np.broadcast_to(template, (count, size)), axis=1)
+        mafia = seats == 2
+
+        # Everyone votes for anyone, themselves included, like the vote reactions allow
+        targets = rng.integers(0, size, (count, size))
+        if behavior != "random":
+            # A mafia seat per round, the one informed voters point at
+            weights = rng.random((count, size)) * mafia
+            suspect = np.where(mafia.any(axis=1), weights.argmax(axis=1), rng.integers(0, size, count))
+
+            if behavior == "informed":
+                # Each town player finds the mafia with `accuracy`
+                informed = (seats == 1) & (rng.random((count, size)) < accuracy)
+                targets = np.where(informed, suspect[:, None], targets)
+            else:
+                # A `herd` share of voters follows the round's suspect, right or wrong
+                wrong = rng.random(count) >= accuracy
+                suspect = np.where(wrong, rng.integers(0, size, count), suspect)
+                follows = rng.random((count, size)) < herd
+                targets = np.where(follows, suspect[:, None], targets)
+
+            # Mafia deflect onto a random non mafia seat
+            deflect = rng.random((count, size)) * ~mafia
+            targets = np.where(mafia, deflect.argmax(axis=1)[:, None], targets)
+
+        voted = rng.random((count, size)) < turnout
+        ballots = (rows * size + targets)[voted]
+        counts = np.bincount(ballots, minlength=count * size).reshape(count, size)
+
+        # Reveal: every player tied for the most votes is caught, nobody if nobody voted
+        most = counts.max(axis=1, keepdims=True)
+        caught = (counts == most) & (most > 0)
+
+        town_win = (caught & mafia).any(axis=1)
+        totals["rounds"] += count
+        totals["town"] += int(town_win.sum())
+        totals["mafia"] += int(count - town_win.sum())
+        totals["neutral"] += int((caught & (seats == 3)).any(axis=1).sum())
+        totals["ties"] += int((caught.sum(axis=1) > 1).sum())
+
+        town_votes = voted & (seats == 1)
+        totals["votes"] += int(town_votes.sum())
+        totals["correct"] += int((town_votes & mafia[rows, targets]).sum())
+    return totals
+
+
+def _simulate_job(job):
+    return job[0], simulate(*job[1:])
+
+
+def run(args):
+    planner = CompositionPlanner()
+    seeds = np.random.SeedSequence(args.seed)
+
+    jobs = []
+    for game_type in args.types:
+        for size in args.sizes:
+            template = alignments(planner, game_type, size)
+            for part, seed in enumerate(seeds.spawn(args.workers)):
+                rounds = args.rounds // args.workers + (part < args.rounds % args.workers)
+                jobs.append(((game_type, size), template, rounds, args.behavior, args.accuracy,
+                             args.herd, args.turnout, seed))
+
+    if args.workers > 1:
+        with ProcessPoolExecutor(args.workers) as pool:
+            results = list(pool.map(_simulate_job, jobs))
+    else:
+        results = [_simulate_job(job) for job in jobs]
+
+    table = {}
+    for key, totals in results:
+        merged = table.setdefault(key, dict.fromkeys(totals, 0))
+        for name, value in totals.items():
+            merged[name] += value
+    return table
+
+
+def report(table):
+    rows = []
+    for (game_type, size), totals in table.items():
+        rounds = totals["rounds"]
+        rows.append({
+            "game_type": game_type,
+            "players": size,
+            "rounds": rounds,
+            "town_win": totals["town"] / rounds,
+            "mafia_win": totals["mafia"] / rounds,
+            "neutral_win": totals["neutral"] / rounds,
+            "tie_rate": totals["ties"] / rounds,
+            "correct_vote_rate": totals["correct"] / totals["votes"] if totals["votes"] else 0.0
+        })
+    return rows
+
+
+def print_report(rows):
+    print("{:<10} {:>7} {:>10} {:>8} {:>8} {:>8} {:>8} {:>8}".format(
+        "type", "players", "rounds", "town", "mafia", "neutral", "ties", "correct"))
+    for row in rows:
+        print("{game_type:<10} {players:>7} {rounds:>10} {town_win:>8.3f} {mafia_win:>8.3f} "
+              "{neutral_win:>8.3f} {tie_rate:>8.3f} {correct_vote_rate:>8.3f}".format(**row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--types", nargs="+", default=sorted(CompositionPlanner().compositions))
+    parser.add_argument("--sizes", nargs="+", type=int, default=[4, 6, 8, 10, 12])
+    parser.add_argument("--rounds", type=int, default=1000000, help="Rounds per type and size")
+    parser.add_argument("--behavior", choices=BEHAVIORS, default="informed")
+    parser.add_argument("--accuracy", type=float, default=0.3,
+                        help="Chance town (informed) or the crowd (herd) picks a mafia player")
+    parser.add_argument("--herd", type=float, default=0.5, help="Share of voters following the crowd")
+    parser.add_argument("--turnout", type=float, default=0.9, help="Chance a player votes at all")
+    parser.add_argument("--workers", type=int, default=1, help="Processes to split the rounds over")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the table to this file")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = report(run(args))
+    print_report(rows)
+    print("\n{} rounds in {:.2f}s".format(sum(row["rounds"] for row in rows), time.perf_counter() - started))
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(rows, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+"""
+End-to-end load benchmark of Game rounds against the fake Discord
+
+Drives N guilds x M players through full sessions at once and reports
+API calls per round, wall time per phase and peak memory:
+
+    python benchmarks/bench_rounds.py --guilds 50 --players 12 --rounds 2
+    python benchmarks/bench_rounds.py --rate-limit-chance 0.05 --json bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakediscord  # noqa: E402
+
+fakediscord.install()
+
+from mafia import game as game_module  # noqa: E402
+from mafia.mafia import Mafia  # noqa: E402
+from mafia.phase import Phase  # noqa: E402
+
+FLAG = "🏁"
+
+
+class Crowd:
+    """
+    Simulated players of one guild reacting to the game's messages
+    """
+
+    def __init__(self, bench, guild, members, rounds):
+        self.bench = bench
+        self.guild = guild
+        self.members = members
+        self.rounds_left = rounds
+        self.random = random.Random(guild.id)
+        self.vote_pages = []
+
+    def on_message(self, message):
+        if message.guild is not self.guild or message.embed is None:
+            return
+
+        game = self.bench.cog.games.get(self.guild.id)
+        title = message.embed.title
+
+        if title == "Respond with the {} when the game is done".format(FLAG):
+            self.later(self.bench.args.match_seconds, self.react(message, self.members[0], FLAG))
+        elif game is not None and game.phase is Phase.VOTE:
+            self.vote_pages.append(message)
+            if len(self.vote_pages) == 1:
+                self.later(self.bench.args.vote_seconds / 2, self.vote())
+        elif title == "Would you like to continue?":
+            self.rounds_left -= 1
+            answer = fakediscord.ReactionPredicate.YES_OR_NO_EMOJIS[0 if self.rounds_left > 0 else 1]
+            self.later(0.01, self.react(message, self.members[0], answer))
+
+    def later(self, delay, coroutine):
+        async def run():
+            await asyncio.sleep(delay)
+            await coroutine
+        asyncio.ensure_future(run())
+
+    async def react(self, message, member, emoji):
+        self.guild.bot.dispatch("raw_reaction_add",
+                                fakediscord.RawReactionActionEvent(message, member.id, emoji,
+                                                                   "REACTION_ADD", member))
+
+    async def vote(self):
+        pages, self.vote_pages = self.vote_pages, []
+        for member in self.members:
+            page = self.random.choice(pages)
+            options = getattr(page, "pending_reactions", None)
+            if options:
+                await self.react(page, member, self.random.choice(options))
+
+
+class Bench:
+    def __init__(self, args):
+        self.args = args
+        self.api = fakediscord.FakeAPI(latency=args.latency, jitter=args.latency / 2,
+                                       rate_limit_chance=args.rate_limit_chance,
+                                       surface_429=args.surface_429, seed=args.seed)
+        self.bot = fakediscord.Bot(self.api)
+        self.timings = defaultdict(list)
+        self.crowds = []
+        self.cog = None
+
+    def instrument(self, game):
+        """
+        Time every phase handler and tag API calls with the phase
+        """
+        for phase, handler in list(game._handlers.items()):
+            game._handlers[phase] = self._timed(game.guild.id, phase.value, handler)
+
+    def _timed(self, guild_id, name, handler):
+        async def timed(ctx):
+            self.api.tags[guild_id] = name
+            started = time.perf_counter()
+            try:
+                return await handler(ctx)
+            finally:
+                self.timings[name].append(time.perf_counter() - started)
+                self.api.tags[guild_id] = None
+        return timed
+
+    async def session(self, index):
+        guild = fakediscord.Guild(self.bot, self.api, name="Guild {}".format(index))
+        self.bot.guilds[guild.id] = guild
+        members = [guild.add_member("player{:02d}".format(number),
+                                    dms_open=number >= self.args.closed_dms)
+                   for number in range(self.args.players)]
+
+        crowd = Crowd(self, guild, members, self.args.rounds)
+        self.crowds.append(crowd)
+        self.bot.message_hooks.append(crowd.on_message)
+
+        self.api.tags[guild.id] = "lobby"
+        host = fakediscord.Context(self.bot, guild, members[0], guild.general)
+        await self.cog.mafia_new(host)
+        for member in members:
+            await self.cog.mafia_join(fakediscord.Context(self.bot, guild, member, guild.general))
+
+        self.instrument(self.cog.games.get(guild.id))
+        await self.cog.mafia_start(host)
+
+    async def run(self):
+        game_module.VOTE_SECONDS = self.args.vote_seconds
+
+        self.cog = Mafia(self.bot)
+        self.bot.add_cog(self.cog)
+
+        tracemalloc.start()
+        started = time.perf_counter()
+        await asyncio.gather(*[self.session(index) for index in range(self.args.guilds)])
+        wall = time.perf_counter() - started
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        self.cog.cog_unload()
+        await asyncio.sleep(0.1)
+        return self.report(wall, peak)
+
+    def report(self, wall, peak):
+        rounds = self.args.guilds * self.args.rounds
+        phases = {}
+        for name, durations in self.timings.items():
+            durations = sorted(durations)
+            phases[name] = {
+                "mean_s": sum(durations) / len(durations),
+                "p95_s": durations[min(len(durations) - 1, int(len(durations) * 0.95))],
+                "api_calls_per_round": self.api.count(tag=name) / rounds,
+                "rate_limits": self.api.rate_limits[name],
+                "rate_limit_wait_s": self.api.rate_limit_wait[name]
+            }
+
+        routes = defaultdict(int)
+        for route, _, _ in self.api.calls:
+            routes[route] += 1
+
+        return {
+            "guilds": self.args.guilds,
+            "players": self.args.players,
+            "rounds": self.args.rounds,
+            "wall_s": wall,
+            "peak_memory_kib": peak / 1024,
+            "api_calls": len(self.api.calls),
+            "api_calls_per_round": len(self.api.calls) / rounds,
+            "lobby_api_calls": self.api.count(tag="lobby"),
+            "phases": phases,
+            "routes": dict(sorted(routes.items()))
+        }
+
+
+def print_report(report):
+    print("{guilds} guilds x {players} players x {rounds} rounds".format(**report))
+    print("wall {wall_s:.2f}s, peak memory {peak_memory_kib:.0f} KiB".format(**report))
+    print("API calls {api_calls} total, {api_calls_per_round:.1f} per round, "
+          "{lobby_api_calls} in lobby".format(**report))
+    print()
+    print("{:<10} {:>9} {:>9} {:>11} {:>8}".format("phase", "mean s", "p95 s", "calls/rnd", "429s"))
+    for phase in Phase:
+        stats = report["phases"].get(phase.value)
+        if stats is not None:
+            print("{:<10} {mean_s:>9.3f} {p95_s:>9.3f} {api_calls_per_round:>11.1f} "
+                  "{rate_limits:>8}".format(phase.value, **stats))
+    print()
+    for route, count in report["routes"].items():
+        print("{:<20} {:>8}".format(route, count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--guilds", type=int, default=20)
+    parser.add_argument("--players", type=int, default=10)
+    parser.add_argument("--rounds", type=int, default=2)
+    parser.add_argument("--latency", type=float, default=0.02, help="Simulated API latency in seconds")
+    parser.add_argument("--rate-limit-chance", type=float, default=0.0, help="Chance of a 429 per API call")
+    parser.add_argument("--surface-429", action="store_true", help="Raise 429s on routes the cog retries itself")
+    parser.add_argument("--closed-dms", type=int, default=0, help="Players per guild with DMs closed")
+    parser.add_argument("--vote-seconds", type=float, default=1.0)
+    parser.add_argument("--match-seconds", type=float, default=0.1)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    report = asyncio.run(Bench(args).run())
+    print_report(report)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark of the team partitioner against lobby size
+
+Splits random lobbies into 2, 3 and 4 teams and reports the time per
+split and the gap between the strongest and weakest team:
+
+    python benchmarks/bench_teams.py --sizes 4 8 12 16 24 40 --lobbies 20
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fakediscord  # noqa: E402
+
+fakediscord.install()
+
+from mafia import teams  # noqa: E402
+
+
+def run(args):
+    generator = random.Random(args.seed)
+    rows = []
+    for team_count in args.teams:
+        for size in args.sizes:
+            if size < team_count:
+                continue
+
+            durations, gaps = [], []
+            for _ in range(args.lobbies):
+                scores = [generator.randint(0, args.max_score) for _ in range(size)]
+                mafia = [index < max(1, size // 5) for index in range(size)]
+                generator.shuffle(mafia)
+
+                started = time.perf_counter()
+                split = teams.split_teams(scores, team_count, mafia, time_limit=args.time_limit)
+                durations.append(time.perf_counter() - started)
+                gaps.append(teams.spread(scores, split))
+
+            durations.sort()
+            rows.append({
+                "teams": team_count,
+                "players": size,
+                "exact": size <= teams.EXACT_PLAYERS.get(team_count, 8),
+                "mean_ms": sum(durations) / len(durations) * 1000,
+                "max_ms": durations[-1] * 1000,
+                "mean_gap": sum(gaps) / len(gaps)
+            })
+    return rows
+
+
+def print_report(rows):
+    print("{:>5} {:>7} {:>6} {:>9} {:>9} {:>9}".format("teams", "players", "exact", "mean ms", "max ms", "mean gap"))
+    for row in rows:
+        print("{teams:>5} {players:>7} {exact!s:>6} {mean_ms:>9.2f} {max_ms:>9.2f} {mean_gap:>9.2f}".format(**row))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", nargs="+", type=int, default=[4, 6, 8, 10, 12, 16, 20, 30, 40])
+    parser.add_argument("--teams", nargs="+", type=int, default=[2, 3, 4])
+    parser.add_argument("--lobbies", type=int, default=20, help="Random lobbies per size")
+    parser.add_argument("--max-score", type=int, default=50)
+    parser.add_argument("--time-limit", type=float, default=teams.TIME_LIMIT,
+                        help="Seconds the heuristic may spend per split")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    rows = run(args)
+    print_report(rows)
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump(rows, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,626 @@
+"""
+Offline stand-in for the discord.py and Red surfaces the mafia cog uses
+
+`install()` registers fake `discord` and `redbot` modules in
+sys.modules, it has to run before `mafia` is imported. Every call that
+would hit Discord goes through `FakeAPI.request`, which records it,
+sleeps a configurable latency and injects 429s the way discord.py sees
+them: retried internally after `retry_after`, or, with `surface_429`,
+raised as an HTTPException on the routes the cog retries itself.
+"""
+import asyncio
+import copy
+import itertools
+import random
+import sys
+import types
+from collections import Counter, defaultdict
+
+_ids = itertools.count(1000)
+
+
+def next_id():
+    return next(_ids)
+
+
+class FakeAPI:
+    """
+    Simulated HTTP layer, one per harness
+    """
+
+    # Routes the cog retries itself, everything else relies on discord.py
+    SELF_RETRIED = frozenset(("member.add_role", "member.remove_role", "dm.send", "message.edit"))
+
+    def __init__(self, latency=0.02, jitter=0.01, rate_limit_chance=0.0, retry_after=0.1,
+                 surface_429=False, seed=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.rate_limit_chance = rate_limit_chance
+        self.retry_after = retry_after
+        self.surface_429 = surface_429
+        self.random = random.Random(seed)
+
+        self.calls = []  # (route, guild id, tag)
+        self.rate_limits = Counter()
+        self.rate_limit_wait = defaultdict(float)
+        self.tags = {}  # guild id -> tag, e.g. the current phase
+
+    async def request(self, route, guild_id=None):
+        tag = self.tags.get(guild_id)
+        self.calls.append((route, guild_id, tag))
+
+        while self.random.random() < self.rate_limit_chance:
+            self.rate_limits[tag] += 1
+            if self.surface_429 and route in self.SELF_RETRIED:
+                raise HTTPException(status=429, retry_after=self.retry_after)
+            self.rate_limit_wait[tag] += self.retry_after
+            await asyncio.sleep(self.retry_after)
+
+        await asyncio.sleep(max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter)))
+
+    def count(self, route=None, tag=None):
+        return sum(1 for call_route, _, call_tag in self.calls
+                   if (route is None or call_route == route) and (tag is None or call_tag == tag))
+
+
+# discord ---------------------------------------------------------------------
+
+class HTTPException(Exception):
+    def __init__(self, status=400, message="", retry_after=None):
+        super().__init__(message or str(status))
+        self.status = status
+        self.retry_after = retry_after
+
+
+class Forbidden(HTTPException):
+    def __init__(self, message="Forbidden"):
+        super().__init__(403, message)
+
+
+class NotFound(HTTPException):
+    def __init__(self, message="Not Found"):
+        super().__init__(404, message)
+
+
+class Hashable:
+    id = 0
+
+    def __eq__(self, other):
+        return isinstance(other, self.__class__) and other.id == self.id
+
+    def __hash__(self):
+        return hash(self.id)
+
+
+class Object(Hashable):
+    def __init__(self, id):
+        self.id = id
+
+
+class Embed:
+    def __init__(self, title=None, description=None, color=None, colour=None, **kwargs):
+        self.title = title
+        self.description = description
+        self.color = color if color is not None else colour
+        self.fields = []
+        self.footer = None
+
+    def add_field(self, name, value, inline=True):
+        self.fields.append(types.SimpleNamespace(name=name, value=value, inline=inline))
+        return self
+
+    def insert_field_at(self, index, name, value, inline=True):
+        self.fields.insert(index, types.SimpleNamespace(name=name, value=value, inline=inline))
+        return self
+
+    def set_field_at(self, index, name, value, inline=True):
+        self.fields[index] = types.SimpleNamespace(name=name, value=value, inline=inline)
+        return self
+
+    def remove_field(self, index):
+        del self.fields[index]
+
+    def clear_fields(self):
+        self.fields = []
+
+    def set_footer(self, text=None, icon_url=None):
+        self.footer = text
+        return self
+
+    def copy(self):
+        return copy.deepcopy(self)
+
+
+class PermissionOverwrite:
+    def __init__(self, **permissions):
+        self._values = permissions
+
+    def __eq__(self, other):
+        return isinstance(other, PermissionOverwrite) and other._values == self._values
+
+    def __hash__(self):
+        return hash(tuple(sorted(self._values.items())))
+
+
+class PartialEmoji:
+    def __init__(self, name):
+        self.name = name
+
+    def __str__(self):
+        return self.name
+
+
+class RawReactionActionEvent:
+    def __init__(self, message, user_id, emoji, event_type, member=None):
+        self.message_id = message.id
+        self.channel_id = message.channel.id
+        self.guild_id = message.channel.guild.id
+        self.user_id = user_id
+        self.emoji = PartialEmoji(emoji)
+        self.event_type = event_type
+        self.member = member
+
+
+class RawMessageDeleteEvent:
+    def __init__(self, message):
+        self.message_id = message.id
+        self.channel_id = message.channel.id
+        self.guild_id = message.channel.guild.id
+
+
+class Role(Hashable):
+    def __init__(self, guild, name, mentionable=False, id=None):
+        self.id = id or next_id()
+        self.guild = guild
+        self.name = name
+        self.mentionable = mentionable
+
+    @property
+    def mention(self):
+        return "<@&{}>".format(self.id)
+
+    async def edit(self, reason=None, **fields):
+        await self.guild.api.request("role.edit", self.guild.id)
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+    async def delete(self, reason=None):
+        await self.guild.api.request("role.delete", self.guild.id)
+        self.guild.roles.remove(self)
+        del self.guild._index[self.id]
+
+
+class Member(Hashable):
+    def __init__(self, guild, name, bot=False, dms_open=True):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.display_name = name
+        self.bot = bot
+        self.dms_open = dms_open
+        self.roles = [guild.default_role] if guild.default_role is not None else []
+        self.dms = []
+
+    @property
+    def mention(self):
+        return "<@{}>".format(self.id)
+
+    async def add_roles(self, *roles, reason=None):
+        for role in roles:
+            await self.guild.api.request("member.add_role", self.guild.id)
+            if role not in self.roles:
+                self.roles.append(role)
+
+    async def remove_roles(self, *roles, reason=None):
+        for role in roles:
+            await self.guild.api.request("member.remove_role", self.guild.id)
+            if role in self.roles:
+                self.roles.remove(role)
+
+    async def send(self, content=None, embed=None):
+        await self.guild.api.request("dm.send", self.guild.id)
+        if not self.dms_open:
+            raise Forbidden("Cannot send messages to this user")
+        self.dms.append(embed or content)
+
+
+class Message(Hashable):
+    def __init__(self, channel, content=None, embed=None):
+        self.id = next_id()
+        self.channel = channel
+        self.guild = channel.guild
+        self.content = content
+        self.embed = embed.copy() if embed is not None else None
+        self.reactions = []
+        self.deleted = False
+
+    async def edit(self, content=None, embed=None):
+        await self.guild.api.request("message.edit", self.guild.id)
+        if self.deleted:
+            raise NotFound()
+        if content is not None:
+            self.content = content
+        if embed is not None:
+            self.embed = embed.copy()
+
+    async def delete(self):
+        await self.guild.api.request("message.delete", self.guild.id)
+        self.deleted = True
+        self.guild.bot.dispatch("raw_message_delete", RawMessageDeleteEvent(self))
+
+    async def add_reaction(self, emoji):
+        await self.guild.api.request("reaction.add", self.guild.id)
+        self.reactions.append(emoji)
+        self.guild.bot.dispatch("raw_reaction_add",
+                                RawReactionActionEvent(self, self.guild.bot.user.id, emoji, "REACTION_ADD"))
+
+
+class _Channel(Hashable):
+    def __init__(self, guild, name, overwrites=None, category=None):
+        self.id = next_id()
+        self.guild = guild
+        self.name = name
+        self.overwrites = dict(overwrites or {})
+        self.category = category
+
+    @property
+    def category_id(self):
+        return self.category.id if self.category is not None else None
+
+    async def edit(self, reason=None, overwrites=None, **fields):
+        await self.guild.api.request("channel.edit", self.guild.id)
+        if overwrites is not None:
+            self.overwrites = dict(overwrites)
+        for key, value in fields.items():
+            setattr(self, key, value)
+
+
+class CategoryChannel(_Channel):
+    async def delete(self, reason=None):
+        await self.guild.api.request("channel.delete", self.guild.id)
+        self.guild.categories.remove(self)
+        del self.guild._index[self.id]
+
+
+class TextChannel(_Channel):
+    def __init__(self, guild, name, overwrites=None, category=None):
+        super().__init__(guild, name.lower(), overwrites, category)
+        self.messages = []
+
+    @property
+    def mention(self):
+        return "<#{}>".format(self.id)
+
+    async def send(self, content=None, embed=None):
+        await self.guild.api.request("message.send", self.guild.id)
+        message = Message(self, content, embed)
+        self.messages.append(message)
+        self.guild.bot.on_message_sent(message)
+        return message
+
+    async def delete(self, reason=None):
+        await self.guild.api.request("channel.delete", self.guild.id)
+        self.guild.text_channels.remove(self)
+        del self.guild._index[self.id]
+
+
+class Guild(Hashable):
+    def __init__(self, bot, api, name="Guild"):
+        self.id = next_id()
+        self.bot = bot
+        self.api = api
+        self.name = name
+        self._index = {}  # ID -> member, role or channel, like discord.py's cache
+        self.default_role = None
+        self.default_role = self._add(Role(self, "@everyone", id=self.id))
+        self.roles = [self.default_role]
+        self.categories = []
+        self.text_channels = []
+        self.members = []
+        self.me = self.add_member(bot.user.name, bot=True)
+        self.general = self._add(TextChannel(self, "general"))
+        self.text_channels.append(self.general)
+
+    def _add(self, item):
+        self._index[item.id] = item
+        return item
+
+    def add_member(self, name, bot=False, dms_open=True):
+        member = self._add(Member(self, name, bot=bot, dms_open=dms_open))
+        self.members.append(member)
+        return member
+
+    def _get(self, item_id, kind):
+        item = self._index.get(item_id)
+        return item if isinstance(item, kind) else None
+
+    def get_member(self, member_id):
+        return self._get(member_id, Member)
+
+    def get_role(self, role_id):
+        return self._get(role_id, Role)
+
+    def get_channel(self, channel_id):
+        return self._get(channel_id, _Channel)
+
+    async def create_role(self, name, reason=None, **fields):
+        await self.api.request("role.create", self.id)
+        role = self._add(Role(self, name, **fields))
+        self.roles.append(role)
+        return role
+
+    async def create_category(self, name, overwrites=None, reason=None):
+        await self.api.request("channel.create", self.id)
+        category = self._add(CategoryChannel(self, name, overwrites))
+        self.categories.append(category)
+        return category
+
+    async def create_text_channel(self, name, overwrites=None, category=None, reason=None):
+        await self.api.request("channel.create", self.id)
+        channel = self._add(TextChannel(self, name, overwrites, category))
+        self.text_channels.append(channel)
+        return channel
+
+
+class Bot:
+    """
+    Routes events to cog listeners and messages to the harness
+    """
+
+    def __init__(self, api=None):
+        self.http = api
+        self.user = types.SimpleNamespace(id=next_id(), name="MafiaBot")
+        self.guilds = {}
+        self.cogs = []
+        self.message_hooks = []
+
+    def add_cog(self, cog):
+        self.cogs.append(cog)
+
+    def get_guild(self, guild_id):
+        return self.guilds.get(guild_id)
+
+    async def wait_until_ready(self):
+        return
+
+    def dispatch(self, event, *args):
+        for cog in self.cogs:
+            listener = getattr(cog, "on_" + event, None)
+            if listener is not None:
+                asyncio.ensure_future(listener(*args))
+
+    def on_message_sent(self, message):
+        for hook in self.message_hooks:
+            hook(message)
+
+    async def wait_for(self, event, check=None, timeout=None):
+        raise NotImplementedError("The cog routes reactions through its own dispatcher")
+
+
+class Context:
+    def __init__(self, bot, guild, author, channel):
+        self.bot = bot
+        self.guild = guild
+        self.author = author
+        self.channel = channel
+        self.invoked_subcommand = None
+
+    async def send(self, content=None, embed=None):
+        return await self.channel.send(content, embed=embed)
+
+
+# redbot ----------------------------------------------------------------------
+
+class _ValueContext:
+    def __init__(self, value):
+        self._value = value
+
+    def __await__(self):
+        return self._value._get().__await__()
+
+    async def __aenter__(self):
+        self._raw = await self._value._get()
+        return self._raw
+
+    async def __aexit__(self, *exc):
+        await self._value.set(self._raw)
+
+
+class _Value:
+    def __init__(self, data, key, default):
+        self._data = data
+        self._key = key
+        self._default = default
+
+    def __call__(self):
+        return _ValueContext(self)
+
+    async def _get(self):
+        if self._key not in self._data:
+            return copy.deepcopy(self._default)
+        return copy.deepcopy(self._data[self._key])
+
+    async def set(self, value):
+        self._data[self._key] = copy.deepcopy(value)
+
+    async def clear(self):
+        self._data.pop(self._key, None)
+
+
+class _Group:
+    def __init__(self, data, defaults):
+        self._data = data
+        self._defaults = defaults
+
+    def __getattr__(self, key):
+        if key.startswith("_"):
+            raise AttributeError(key)
+        return _Value(self._data, key, self._defaults.get(key))
+
+    async def all(self):
+        merged = copy.deepcopy(self._defaults)
+        merged.update(copy.deepcopy(self._data))
+        return merged
+
+    async def set_raw(self, *keys, value):
+        data = self._data
+        for key in keys[:-1]:
+            data = data.setdefault(key, {})
+        data[keys[-1]] = copy.deepcopy(value)
+
+    async def get_raw(self, *keys, default=None):
+        data = await self.all()
+        for key in keys:
+            if key not in data:
+                return default
+            data = data[key]
+        return data
+
+    async def clear(self):
+        self._data.clear()
+
+
+class Config:
+    """
+    In-memory Config, shared per identifier so a reloaded cog sees its data
+    """
+
+    _stores = {}
+
+    def __init__(self, identifier):
+        self._store = self._stores.setdefault(identifier, {"global": {}, "guild": {}})
+        self._global_defaults = {}
+        self._guild_defaults = {}
+
+    @classmethod
+    def get_conf(cls, cog, identifier, force_registration=False):
+        return cls(identifier)
+
+    def register_global(self, **defaults):
+        self._global_defaults.update(defaults)
+
+    def register_guild(self, **defaults):
+        self._guild_defaults.update(defaults)
+
+    def guild(self, guild):
+        return _Group(self._store["guild"].setdefault(guild.id, {}), self._guild_defaults)
+
+    def guild_from_id(self, guild_id):
+        return _Group(self._store["guild"].setdefault(guild_id, {}), self._guild_defaults)
+
+    def __getattr__(self, key):
+        if key.startswith("_"):
+            raise AttributeError(key)
+        return _Value(self._store["global"], key, self._global_defaults.get(key))
+
+    async def all_guilds(self):
+        result = {}
+        for guild_id, data in self._store["guild"].items():
+            merged = copy.deepcopy(self._guild_defaults)
+            merged.update(copy.deepcopy(data))
+            result[guild_id] = merged
+        return result
+
+
+def _passthrough(*args, **kwargs):
+    return lambda function: function
+
+
+def _group(*args, **kwargs):
+    def decorator(function):
+        function.command = _passthrough
+        function.group = _group
+        return function
+    return decorator
+
+
+class Cog:
+    listener = staticmethod(_passthrough)
+
+
+class ReactionPredicate:
+    NUMBER_EMOJIS = [chr(code) + "\N{VARIATION SELECTOR-16}\N{COMBINING ENCLOSING KEYCAP}"
+                     for code in range(ord("0"), ord("9") + 1)]
+    YES_OR_NO_EMOJIS = ("\N{WHITE HEAVY CHECK MARK}", "\N{NEGATIVE SQUARED CROSS MARK}")
+
+
+def start_adding_reactions(message, emojis):
+    emojis = list(emojis)
+    message.pending_reactions = emojis
+
+    async def add():
+        for emoji in emojis:
+            await message.add_reaction(emoji)
+
+    return asyncio.ensure_future(add())
+
+
+def box(text, lang=""):
+    return "```{}\n{}\n```".format(lang, text)
+
+
+def cog_data_path(cog_instance=None, raw_name=None):
+    import pathlib
+    import tempfile
+    path = pathlib.Path(tempfile.gettempdir()) / "mafia-bench" / (raw_name or "Mafia")
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def install():
+    """
+    Register the fake discord and redbot modules
+    """
+    discord = types.ModuleType("discord")
+    for name in ("HTTPException", "Forbidden", "NotFound", "Object", "Embed", "PermissionOverwrite",
+                 "PartialEmoji", "RawReactionActionEvent", "RawMessageDeleteEvent", "Role", "Member",
+                 "Message", "CategoryChannel", "TextChannel", "Guild"):
+        setattr(discord, name, globals()[name])
+    discord.User = Member
+    discord.abc = types.ModuleType("discord.abc")
+    discord.abc.Messageable = TextChannel
+
+    redbot = types.ModuleType("redbot")
+    core = types.ModuleType("redbot.core")
+    commands = types.ModuleType("redbot.core.commands")
+    commands.Cog = Cog
+    commands.Context = Context
+    commands.group = _group
+    commands.command = _passthrough
+    commands.guild_only = _passthrough
+    checks = types.ModuleType("redbot.core.checks")
+    checks.is_owner = _passthrough
+    checks.admin_or_permissions = _passthrough
+    checks.mod_or_permissions = _passthrough
+    data_manager = types.ModuleType("redbot.core.data_manager")
+    data_manager.cog_data_path = cog_data_path
+    utils = types.ModuleType("redbot.core.utils")
+    predicates = types.ModuleType("redbot.core.utils.predicates")
+    predicates.ReactionPredicate = ReactionPredicate
+    menus = types.ModuleType("redbot.core.utils.menus")
+    menus.start_adding_reactions = start_adding_reactions
+    chat_formatting = types.ModuleType("redbot.core.utils.chat_formatting")
+    chat_formatting.box = box
+    core.Config = Config
+    core.commands = commands
+    core.checks = checks
+    core.data_manager = data_manager
+    core.utils = utils
+    utils.predicates = predicates
+    utils.menus = menus
+    utils.chat_formatting = chat_formatting
+    redbot.core = core
+
+    sys.modules.update({
+        "discord": discord,
+        "discord.abc": discord.abc,
+        "redbot": redbot,
+        "redbot.core": core,
+        "redbot.core.commands": commands,
+        "redbot.core.checks": checks,
+        "redbot.core.data_manager": data_manager,
+        "redbot.core.utils": utils,
+        "redbot.core.utils.predicates": predicates,
+        "redbot.core.utils.menus": menus,
+        "redbot.core.utils.chat_formatting": chat_formatting,
+    })
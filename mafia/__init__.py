@@ -1,4 +1,6 @@
 from .mafia import Mafia
 
-def setup(bot):
-    bot.add_cog(Mafia())
\ No newline at end of file
+async def setup(bot):
+    cog = Mafia(bot)
+    await cog.initialize()
+    bot.add_cog(cog)
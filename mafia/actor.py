@@ -0,0 +1,135 @@
+import asyncio
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, Hashable, Optional
+
+
+class MailboxStats:
+    """
+    Depth and wait times shared by every game's mailbox
+    """
+
+    def __init__(self, history: int = 1000):
+        self.letters = 0
+        self.coalesced = 0
+        self.depth = 0
+        self.max_depth = 0
+        self.waits: Deque[float] = deque(maxlen=history)
+
+    def posted(self):
+        self.letters += 1
+        self.depth += 1
+        self.max_depth = max(self.max_depth, self.depth)
+
+    def taken(self, waited: float):
+        self.depth -= 1
+        self.waits.append(waited)
+
+    def recent(self) -> dict:
+        """
+        Counters and the wait before a command ran over the recent commands
+        """
+        waits = sorted(self.waits)
+        if not waits:
+            p50 = p95 = 0.0
+        else:
+            p50 = waits[len(waits) // 2]
+            p95 = waits[min(len(waits) - 1, int(len(waits) * 0.95))]
+        return {"letters": self.letters, "coalesced": self.coalesced, "depth": self.depth,
+                "max_depth": self.max_depth, "p50": p50, "p95": p95}
+
+
+class _Letter:
+    __slots__ = ("kind", "subject", "handler", "future", "posted")
+
+    def __init__(self, kind: str, subject: Hashable, handler: Callable[[], Awaitable], posted: float):
+        self.kind = kind
+        self.subject = subject
+        self.handler = handler
+        self.future = asyncio.get_event_loop().create_future()
+        self.posted = posted
+
+
+class GameActor:
+    """
+    Mailbox running one game's commands one at a time, in the order sent
+
+    Each game has its own mailbox, so games of different guilds and
+    lobbies never wait on each other. A command identical to the last one
+    still waiting for the same subject, e.g. a second join by the same
+    member, is coalesced and shares its result instead of running again.
+    The worker only exists while there is mail. A closed mailbox answers
+    everything with None without running it.
+    """
+
+    def __init__(self, stats: MailboxStats = None):
+        self.stats = stats or MailboxStats()
+
+        self._mailbox: Deque[_Letter] = deque()
+        self._latest: Dict[Hashable, _Letter] = {}
+        self._worker: Optional[asyncio.Task] = None
+        self._closed = False
+
+    def __len__(self):
+        return len(self._mailbox)
+
+    def ask(self, kind: str, subject: Hashable, handler: Callable[[], Awaitable],
+            coalesce: bool = True) -> Awaitable:
+        """
+        Queue handler, returns an awaitable of its result
+
+        subject is what the command acts on, like a member ID, or None for
+        the game itself.
+        """
+        if self._closed:
+            refused = asyncio.get_event_loop().create_future()
+            refused.set_result(None)
+            return refused
+
+        latest = self._latest.get(subject)
+        if coalesce and latest is not None and latest.kind == kind:
+            self.stats.coalesced += 1
+            return asyncio.shield(latest.future)
+
+        letter = _Letter(kind, subject, handler, time.monotonic())
+        self._mailbox.append(letter)
+        self._latest[subject] = letter
+        self.stats.posted()
+
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.ensure_future(self._drain())
+        return asyncio.shield(letter.future)
+
+    def close(self):
+        """
+        Drop the mail that hasn't run, whoever waits on it gets None
+
+        A command that is running is cancelled, unless it is the one
+        closing the mailbox, like an end, which runs to completion.
+        """
+        self._closed = True
+        if self._worker is not None and self._worker is not asyncio.current_task():
+            self._worker.cancel()
+        self._worker = None
+        while self._mailbox:
+            letter = self._mailbox.popleft()
+            self.stats.taken(time.monotonic() - letter.posted)
+            letter.future.set_result(None)
+        self._latest = {}
+
+    async def _drain(self):
+        while self._mailbox:
+            letter = self._mailbox.popleft()
+            if self._latest.get(letter.subject) is letter:
+                del self._latest[letter.subject]
+            self.stats.taken(time.monotonic() - letter.posted)
+
+            try:
+                result = await letter.handler()
+            except asyncio.CancelledError:
+                letter.future.set_result(None)
+                raise
+            except Exception as error:
+                letter.future.set_exception(error)
+            else:
+                letter.future.set_result(result)
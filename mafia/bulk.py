@@ -0,0 +1,71 @@
+import asyncio
+from typing import Dict, Iterable, Optional
+
+import discord
+
+from .ratelimit import retry_on_429
+
+
+class RoleResult:
+    """
+    Outcome of a role change for one member
+    """
+
+    __slots__ = ("member", "changed", "error")
+
+    def __init__(self, member: discord.Member, changed: bool = False, error: Optional[Exception] = None):
+        self.member = member
+        self.changed = changed
+        self.error = error
+
+
+class BulkRoleOperator:
+    """
+    Adds or removes a role on many members concurrently
+
+    Member role changes share a per-guild bucket on Discord's side, so at
+    most `limit` requests run at once per guild. Members whose cached
+    roles already match are skipped without a request.
+    """
+
+    def __init__(self, limit: int = 10, attempts: int = 3):
+        self.limit = limit
+        self.attempts = attempts
+        self._semaphores: Dict[int, asyncio.Semaphore] = {}
+
+    async def add(self, members: Iterable[discord.Member], role: discord.Role,
+                  reason: str = None) -> Dict[int, RoleResult]:
+        return await self._apply(members, role, True, reason)
+
+    async def remove(self, members: Iterable[discord.Member], role: discord.Role,
+                     reason: str = None) -> Dict[int, RoleResult]:
+        return await self._apply(members, role, False, reason)
+
+    @staticmethod
+    def failed(results: Dict[int, RoleResult]):
+        return [result for result in results.values() if result.error is not None]
+
+    async def _apply(self, members, role, add, reason):
+        semaphore = self._semaphores.get(role.guild.id)
+        if semaphore is None:
+            semaphore = self._semaphores[role.guild.id] = asyncio.Semaphore(self.limit)
+
+        results = await asyncio.gather(*[self._change(semaphore, member, role, add, reason)
+                                         for member in members])
+        return {result.member.id: result for result in results}
+
+    async def _change(self, semaphore, member, role, add, reason):
+        if (role in member.roles) == add:
+            return RoleResult(member)
+
+        if add:
+            call = lambda: member.add_roles(role, reason=reason)
+        else:
+            call = lambda: member.remove_roles(role, reason=reason)
+
+        async with semaphore:
+            try:
+                await retry_on_429(call, attempts=self.attempts)
+            except discord.HTTPException as error:
+                return RoleResult(member, error=error)
+        return RoleResult(member, changed=True)
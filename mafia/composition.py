@@ -0,0 +1,100 @@
+import random
+from typing import Dict, Iterable, List, Mapping, Sequence, Tuple
+
+from .role import Godfather, Jester, Town
+
+# Role tables per game type as (minimum players, special roles) rows sorted
+# by size. The last row the lobby fits is used and Town fills the rest.
+COMPOSITIONS = {
+    "classic": (
+        (1, {Godfather: 1}),
+    ),
+    "double": (
+        (1, {Godfather: 1}),
+        (7, {Godfather: 2}),
+    ),
+    "jester": (
+        (1, {Godfather: 1}),
+        (5, {Godfather: 1, Jester: 1}),
+    ),
+    "chaos": (
+        (1, {Godfather: 1}),
+        (5, {Godfather: 1, Jester: 1}),
+        (9, {Godfather: 2, Jester: 1}),
+    ),
+}
+DEFAULT_TYPE = "classic"
+# Lobby sizes templates are built for up front, larger ones are built on use
+MAX_PLAYERS = 64
+
+Template = Tuple[type, ...]
+
+
+class CompositionPlanner:
+    """
+    Role templates per game type and lobby size, dealt from a seed
+
+    Templates are built once per game type and lobby size. A deal is a
+    single shuffle of the template with a Random seeded by the caller,
+    so the same seed and roster order always give the same roles.
+    """
+
+    def __init__(self, compositions: Mapping[str, Sequence] = None, max_players: int = MAX_PLAYERS):
+        self.compositions = dict(COMPOSITIONS if compositions is None else compositions)
+        self._templates: Dict[Tuple[str, int], Template] = {}
+
+        for game_type in self.compositions:
+            for size in range(1, max_players + 1):
+                self._templates[(game_type, size)] = self._build(game_type, size)
+
+    @property
+    def types(self) -> List[str]:
+        return sorted(self.compositions)
+
+    def template(self, game_type: str, size: int) -> Template:
+        """
+        Roles of a lobby in a fixed order, specials first
+        """
+        template = self._templates.get((game_type, size))
+        if template is None:
+            template = self._templates[(game_type, size)] = self._build(game_type, size)
+        return template
+
+    def deal(self, game_type: str, size: int, seed: int) -> List[type]:
+        """
+        Role classes for `size` players in seat order
+        """
+        roles = list(self.template(game_type, size))
+        random.Random(seed).shuffle(roles)
+        return roles
+
+    def deal_many(self, game_type: str, size: int, seeds: Iterable[int]) -> List[List[type]]:
+        """
+        One deal per seed, each the same as `deal` with that seed
+        """
+        template = self.template(game_type, size)
+        generator = random.Random()
+
+        deals = []
+        for seed in seeds:
+            roles = list(template)
+            generator.seed(seed)
+            generator.shuffle(roles)
+            deals.append(roles)
+        return deals
+
+    def _build(self, game_type: str, size: int) -> Template:
+        if game_type not in self.compositions:
+            raise KeyError("Unknown game type {}".format(game_type))
+        if size < 1:
+            raise ValueError("A lobby needs at least one player")
+
+        specials = {}
+        for minimum, row in self.compositions[game_type]:
+            if size >= minimum:
+                specials = row
+
+        roles = [role_class for role_class, count in specials.items() for _ in range(count)]
+        if len(roles) > size:
+            raise ValueError("{} needs more than {} players".format(game_type, size))
+        return tuple(roles) + (Town,) * (size - len(roles))
@@ -0,0 +1,152 @@
+import asyncio
+from typing import Optional
+
+import discord
+
+from .composition import DEFAULT_TYPE
+
+# Players per page of the roster
+PAGE_SIZE = 20
+PREVIOUS = "◀"
+NEXT = "▶"
+
+
+class Dashboard:
+    """
+    One message per game showing its phase, roster, queue and scores
+
+    The message is sent once and then edited in place. Refreshes made in
+    the same loop iteration are rendered once, and the cog's editor
+    coalesces whatever the channel's rate limit holds back, so a burst
+    of joins costs a single edit. Rosters longer than a page get ◀ ▶
+    reactions to page through them.
+    """
+
+    def __init__(self, game):
+        self.game = game
+        self.message: Optional[discord.Message] = None
+        self.page = 0
+        self._scheduled = False
+        self._paged = False
+
+    def shown_in(self, channel) -> bool:
+        return self.message is not None and channel is not None and self.message.channel.id == channel.id
+
+    async def show(self, channel: discord.TextChannel):
+        """
+        Send the dashboard to channel unless it is shown already, else refresh it
+        """
+        if self.message is None:
+            self.message = await channel.send(embed=self.render())
+            self.game.cog.reactions.subscribe(self.message.id, self.on_reaction, on_delete=self.forget)
+            await self._add_page_reactions()
+        else:
+            self.refresh()
+
+    async def move(self, channel: discord.TextChannel):
+        """
+        Show the dashboard in another channel, deleting the old message
+        """
+        if self.shown_in(channel):
+            self.refresh()
+            return
+        await self.close()
+        await self.show(channel)
+
+    def refresh(self):
+        """
+        Schedule an edit with the game's current state
+        """
+        if self.message is None or self._scheduled:
+            return
+        self._scheduled = True
+        asyncio.get_event_loop().call_soon(self._submit)
+
+    async def close(self):
+        if self.message is None:
+            return
+
+        message, self.message = self.message, None
+        self._paged = False
+        self.game.cog.reactions.unsubscribe(message.id)
+        self.game.cog.editor.discard(message)
+        try:
+            await message.delete()
+        except discord.HTTPException:
+            pass
+
+    def forget(self, message_id: int):
+        """
+        Drop the message once it got deleted by someone else, the next
+        show sends a new one
+        """
+        if self.message is None or self.message.id != message_id:
+            return
+        self.message = None
+        self._paged = False
+        self.game.cog.reactions.unsubscribe(message_id)
+
+    def on_reaction(self, payload: discord.RawReactionActionEvent):
+        """
+        Dispatcher handler turning the pages, adding and removing both count
+        """
+        emoji = str(payload.emoji)
+        if emoji == PREVIOUS:
+            self.page -= 1
+        elif emoji == NEXT:
+            self.page += 1
+        else:
+            return
+        self.refresh()
+
+    def pages(self) -> int:
+        return max(1, -(-len(self.game.players) // PAGE_SIZE))
+
+    def render(self) -> discord.Embed:
+        game = self.game
+        pages = self.pages()
+        self.page %= pages
+
+        embed = discord.Embed(title="Mafia Lobby {}".format(game.lobby_id),
+                              description="Join with `[p]mafia join {}`".format(game.lobby_id))
+        embed.add_field(name="Phase", value=game.phase.value.capitalize())
+        embed.add_field(name="Game Type", value=game.game_type or DEFAULT_TYPE)
+
+        players = list(game.players)[self.page * PAGE_SIZE:(self.page + 1) * PAGE_SIZE]
+        roster = "\n".join("{} - {}".format(player.mention, player.score) for player in players)
+        embed.add_field(name="Players ({})".format(len(game.players)), value=roster or "Nobody yet", inline=False)
+
+        if game.queue.joining:
+            embed.add_field(name="Joining Next Round", value=self._mentions(game.queue.joining), inline=False)
+        if game.queue.leaving:
+            embed.add_field(name="Leaving After This Round", value=self._mentions(game.queue.leaving), inline=False)
+
+        if pages > 1:
+            embed.set_footer(text="Page {}/{}, react {} {} to turn".format(self.page + 1, pages, PREVIOUS, NEXT))
+        return embed
+
+    @staticmethod
+    def _mentions(members) -> str:
+        mentions = " ".join(member.mention for member in members[:PAGE_SIZE])
+        if len(members) > PAGE_SIZE:
+            mentions = mentions + " and {} more".format(len(members) - PAGE_SIZE)
+        return mentions
+
+    def _submit(self):
+        self._scheduled = False
+        if self.message is None:
+            return
+
+        self.game.cog.editor.submit(self.message, on_not_found=self.forget, embed=self.render())
+        if self.pages() > 1 and not self._paged:
+            asyncio.ensure_future(self._add_page_reactions())
+
+    async def _add_page_reactions(self):
+        if self._paged or self.pages() < 2 or self.message is None:
+            return
+        self._paged = True
+        try:
+            for emoji in (PREVIOUS, NEXT):
+                await self.message.add_reaction(emoji)
+        except discord.HTTPException:
+            pass
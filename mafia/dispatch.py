@@ -0,0 +1,131 @@
+import asyncio
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+import discord
+
+
+class MessageDeleted(Exception):
+    """
+    The message a wait was for got deleted
+    """
+
+
+class _Waiter:
+    __slots__ = ("future", "emojis", "user_ids")
+
+    def __init__(self, future: asyncio.Future, emojis: Iterable[str], user_ids: Optional[Iterable[int]]):
+        self.future = future
+        self.emojis = frozenset(emojis)
+        self.user_ids = None if user_ids is None else frozenset(user_ids)
+
+
+class ReactionDispatcher:
+    """
+    Routes raw reaction events to whoever waits on that message
+
+    Waiters and handlers are keyed by message ID, so an event costs one
+    dict lookup no matter how many games are waiting for reactions.
+    Reactions added by the bot itself are ignored.
+    """
+
+    def __init__(self, bot):
+        self.bot = bot
+        self._waiters: Dict[int, List[_Waiter]] = {}
+        self._handlers: Dict[int, Callable[[discord.RawReactionActionEvent], None]] = {}
+        self._deleted: Dict[int, Callable[[int], None]] = {}
+
+    async def wait_for(self, message_id: int, emojis: Iterable[str], user_ids: Iterable[int] = None,
+                       timeout: float = None) -> Tuple[str, int]:
+        """
+        Wait for one of `emojis` to be added to the message
+
+        Returns (emoji, user id), raises asyncio.TimeoutError on timeout
+        and MessageDeleted if the message is deleted meanwhile.
+        """
+        waiter = _Waiter(asyncio.get_event_loop().create_future(), emojis, user_ids)
+        self._waiters.setdefault(message_id, []).append(waiter)
+
+        try:
+            return await asyncio.wait_for(waiter.future, timeout)
+        finally:
+            waiters = self._waiters.get(message_id)
+            if waiters is not None:
+                if waiter in waiters:
+                    waiters.remove(waiter)
+                if not waiters:
+                    del self._waiters[message_id]
+
+    def subscribe(self, message_id: int, handler: Callable[[discord.RawReactionActionEvent], None],
+                  on_delete: Callable[[int], None] = None):
+        """
+        Call handler with every reaction added to or removed from the
+        message, and on_delete with its ID once it is deleted
+        """
+        self._handlers[message_id] = handler
+        if on_delete is not None:
+            self._deleted[message_id] = on_delete
+
+    def unsubscribe(self, message_id: int):
+        self._handlers.pop(message_id, None)
+        self._deleted.pop(message_id, None)
+
+    def cancel(self, message_id: int):
+        """
+        Cancel everyone waiting on the message
+        """
+        self.unsubscribe(message_id)
+        for waiter in self._waiters.get(message_id, ()):
+            if not waiter.future.done():
+                waiter.future.cancel()
+
+    def deleted(self, message_id: int):
+        """
+        Fail everyone waiting on a deleted message with MessageDeleted,
+        their tasks keep running
+        """
+        self._handlers.pop(message_id, None)
+        on_delete = self._deleted.pop(message_id, None)
+        if on_delete is not None:
+            on_delete(message_id)
+        for waiter in self._waiters.get(message_id, ()):
+            if not waiter.future.done():
+                waiter.future.set_exception(MessageDeleted(message_id))
+
+    def resolve(self, message_id: int, emoji: str, user_id: int = None) -> bool:
+        """
+        Complete the waits for emoji on the message as if it was added,
+        whoever they wait for. False if nobody was waiting
+        """
+        resolved = False
+        for waiter in self._waiters.get(message_id, ()):
+            if not waiter.future.done() and emoji in waiter.emojis:
+                waiter.future.set_result((emoji, user_id))
+                resolved = True
+        return resolved
+
+    def close(self):
+        for message_id in list(self._waiters):
+            self.cancel(message_id)
+        self._handlers = {}
+
+    def dispatch(self, payload: discord.RawReactionActionEvent):
+        if self.bot.user is not None and payload.user_id == self.bot.user.id:
+            return
+
+        handler = self._handlers.get(payload.message_id)
+        if handler is not None:
+            handler(payload)
+
+        if payload.event_type != "REACTION_ADD":
+            return
+
+        waiters = self._waiters.get(payload.message_id)
+        if not waiters:
+            return
+
+        emoji = str(payload.emoji)
+        for waiter in waiters:
+            if waiter.future.done() or emoji not in waiter.emojis:
+                continue
+            if waiter.user_ids is None or payload.user_id in waiter.user_ids:
+                waiter.future.set_result((emoji, payload.user_id))
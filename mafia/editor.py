@@ -0,0 +1,101 @@
+import asyncio
+from typing import Callable, Dict, Optional, Tuple
+
+import discord
+
+from .ratelimit import RouteBucket
+
+
+class MessageEditor:
+    """
+    Outbound scheduler for message edits
+
+    Edits are coalesced per message: while a channel's bucket is spent,
+    newer states replace older pending ones, so only the latest state of
+    each message is ever sent.
+    """
+
+    # Discord allows 5 message edits per 5 seconds per channel
+    CHANNEL_LIMIT = 5
+    CHANNEL_PER = 5.0
+
+    def __init__(self, global_limit: int = 20, global_per: float = 1.0):
+        self.global_bucket = RouteBucket(global_limit, global_per)
+
+        self._buckets: Dict[int, RouteBucket] = {}
+        self._pending: Dict[int, Dict[int, Tuple[discord.Message, dict, Optional[Callable]]]] = {}
+        self._workers: Dict[int, asyncio.Task] = {}
+
+    def submit(self, message: discord.Message, on_not_found: Callable[[int], None] = None, **fields):
+        """
+        Queue an edit, replacing any edit still pending for this message
+
+        on_not_found is called with the message ID if the message turns
+        out to be deleted.
+        """
+        channel_id = message.channel.id
+        self._pending.setdefault(channel_id, {})[message.id] = (message, fields, on_not_found)
+
+        worker = self._workers.get(channel_id)
+        if worker is None or worker.done():
+            self._workers[channel_id] = asyncio.ensure_future(self._drain(channel_id))
+
+    def discard(self, message: discord.Message):
+        """
+        Drop a pending edit, e.g. before the message is deleted
+        """
+        pending = self._pending.get(message.channel.id)
+        if pending is not None:
+            pending.pop(message.id, None)
+
+    def load(self, channel: discord.abc.Messageable) -> float:
+        """
+        How busy edits to this channel are (0.0 idle, 1.0 or more saturated)
+        """
+        bucket = self._buckets.get(channel.id)
+        backlog = len(self._pending.get(channel.id, ()))
+        channel_load = bucket.load() if bucket is not None else 0.0
+
+        return max(channel_load, self.global_bucket.load()) + backlog / self.CHANNEL_LIMIT
+
+    def close(self):
+        for worker in self._workers.values():
+            worker.cancel()
+        self._workers = {}
+        self._pending = {}
+
+    def _bucket(self, channel_id: int) -> RouteBucket:
+        bucket = self._buckets.get(channel_id)
+        if bucket is None:
+            bucket = self._buckets[channel_id] = RouteBucket(self.CHANNEL_LIMIT, self.CHANNEL_PER)
+        return bucket
+
+    async def _drain(self, channel_id: int):
+        bucket = self._bucket(channel_id)
+        pending = self._pending[channel_id]
+
+        try:
+            while pending:
+                await bucket.acquire()
+                await self.global_bucket.acquire()
+
+                if not pending:
+                    break
+                message_id = next(iter(pending))
+                message, fields, on_not_found = pending.pop(message_id)
+
+                try:
+                    await message.edit(**fields)
+                except discord.NotFound:
+                    if on_not_found is not None:
+                        on_not_found(message_id)
+                except discord.HTTPException as error:
+                    if error.status == 429:
+                        bucket.backoff(getattr(error, "retry_after", self.CHANNEL_PER))
+                        # Only retry if nothing newer was submitted meanwhile
+                        pending.setdefault(message_id, (message, fields, on_not_found))
+        finally:
+            if self._pending.get(channel_id) is pending and not pending:
+                del self._pending[channel_id]
+            if self._workers.get(channel_id) is asyncio.current_task():
+                del self._workers[channel_id]
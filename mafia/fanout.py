@@ -0,0 +1,84 @@
+import asyncio
+import time
+from collections import deque
+from typing import Iterable, List, Tuple
+
+import discord
+
+from .ratelimit import retry_on_429
+
+
+class FanoutResult:
+    """
+    Delivery report of one DM fan-out
+    """
+
+    __slots__ = ("delivered", "failed", "latencies")
+
+    def __init__(self):
+        self.delivered: List[discord.Member] = []
+        self.failed: List[discord.Member] = []
+        self.latencies: List[float] = []
+
+    def stats(self) -> dict:
+        latencies = sorted(self.latencies)
+        if not latencies:
+            return {"delivered": 0, "failed": len(self.failed), "p50": 0.0, "p95": 0.0, "max": 0.0}
+
+        return {
+            "delivered": len(self.delivered),
+            "failed": len(self.failed),
+            "p50": latencies[len(latencies) // 2],
+            "p95": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            "max": latencies[-1]
+        }
+
+
+class DMFanout:
+    """
+    Sends DMs to many members with bounded concurrency
+
+    Opening DM channels and sending to them is rate limited across the
+    whole bot, so one semaphore is shared by every game. 429s are
+    retried with backoff, members with closed DMs are reported back
+    instead of being handled one at a time.
+    """
+
+    def __init__(self, limit: int = 5, attempts: int = 3, history: int = 100):
+        self.attempts = attempts
+        self.history = deque(maxlen=history)
+        self._semaphore = asyncio.Semaphore(limit)
+
+    async def send(self, messages: Iterable[Tuple[discord.Member, discord.Embed]]) -> FanoutResult:
+        result = FanoutResult()
+        started = time.monotonic()
+
+        await asyncio.gather(*[self._send(result, started, member, embed) for member, embed in messages])
+
+        self.history.append(result.stats())
+        return result
+
+    def recent(self) -> dict:
+        """
+        Delivery latency over the recent fan-outs
+        """
+        if not self.history:
+            return {"rounds": 0, "p50": 0.0, "p95": 0.0, "failed": 0}
+
+        return {
+            "rounds": len(self.history),
+            "p50": sum(stats["p50"] for stats in self.history) / len(self.history),
+            "p95": max(stats["p95"] for stats in self.history),
+            "failed": sum(stats["failed"] for stats in self.history)
+        }
+
+    async def _send(self, result, started, member, embed):
+        async with self._semaphore:
+            try:
+                await retry_on_429(lambda: member.send(embed=embed), attempts=self.attempts)
+            except discord.HTTPException:
+                result.failed.append(member)
+                return
+
+        result.delivered.append(member)
+        result.latencies.append(time.monotonic() - started)
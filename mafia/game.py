@@ -1,14 +1,58 @@
 import asyncio
 import random
-from typing import List, Set
+import time
+from typing import List, Optional, Set
 
 import discord
 from redbot.core import commands
 from redbot.core.utils.predicates import ReactionPredicate
 from redbot.core.utils.menus import start_adding_reactions
 
-from .player import Player
-from .role import Role, Town, Godfather
+from .actor import GameActor
+from .bulk import BulkRoleOperator
+from .composition import DEFAULT_TYPE
+from .dashboard import Dashboard
+from .dispatch import MessageDeleted
+from .history import MAFIA_WIN, TOWN_WIN, RoundRecord
+from .phase import Phase
+from .player import PlayerRegistry, RosterQueue
+from .resources import CATEGORY_NAME, DEFAULT_LOBBY, channel_name
+from .role import Role
+from .tally import VoteTally
+from .teams import split_teams
+
+VOTE_SECONDS = 15
+VOTE_FIELD = "You have {} seconds to vote: ".format(VOTE_SECONDS)
+# Seconds between countdown edits, doubled when the channel is busy
+COUNTDOWN_STEP = 5
+# Number emojis 1-9 per vote message, larger lobbies get more pages
+VOTE_PAGE_SIZE = 9
+# Points for a correct vote by town and for mafia escaping the vote
+TOWN_POINTS = 1
+MAFIA_POINTS = 2
+# Points for a neutral role like the Jester getting the most votes
+NEUTRAL_POINTS = 2
+# Give up waiting on the 🏁 and continue to the vote after an hour
+PLAY_TIMEOUT = 3600
+# Treat an unanswered "continue?" prompt as no
+PROMPT_TIMEOUT = 300
+# Rocket League teams the players are split into by default
+TEAMS = 2
+
+
+class ChannelContext:
+    """
+    Stands in for the command context when a game resumes without a command
+    """
+
+    __slots__ = ("channel",)
+
+    def __init__(self, channel: discord.TextChannel):
+        self.channel = channel
+
+    async def send(self, content=None, **kwargs):
+        return await self.channel.send(content, **kwargs)
+
 
 class Game:
     """
@@ -16,100 +60,239 @@ class Game:
     """
 
     roles: List[Role]
-    players: List[Player]
-    join_queue: List[discord.Member]
-    leave_queue: List[discord.Member]
+    players: PlayerRegistry
+    queue: RosterQueue
 
-    def __init__(self, guild: discord.Guild):
+    def __init__(self, guild: discord.Guild, cog, lobby_id: int = DEFAULT_LOBBY):
         self.guild = guild
+        self.cog = cog
+        self.lobby_id = lobby_id
 
         self.roles = []
-        self.players = []
-        self.join_queue = []
-        self.leave_queue = []
+        self.players = PlayerRegistry()
+        self.queue = RosterQueue()
+        self.dashboard = Dashboard(self)
+        self.actor = GameActor(cog.mailboxes)
 
         self.vote_totals = {}
-
-        self.started = False
-        self.game_over = False
+        self.tally = None
+        self.dm_stats = None
+
+        self.phase = Phase.LOBBY
+        self._task = None
+        self._channel = None
+        self._handlers = {
+            Phase.JOIN: self._phase_join,
+            Phase.SETUP: self._phase_setup,
+            Phase.DEAL: self._phase_deal,
+            Phase.PLAY: self._phase_play,
+            Phase.VOTE: self._phase_vote,
+            Phase.REVEAL: self._phase_reveal,
+            Phase.TEARDOWN: self._phase_teardown
+        }
 
         self.game_role = None
         self.channel_category = None
         self.village_channel = None
-        self.game_type = None     
+        self.game_type = None
+        self.deal_seed = None
+        self.team_count = TEAMS
+        self.match_started = None
+        self._flag_message_id = None
+        self._prompts: List[discord.Message] = []  # Messages the running phase waits on reactions to
 
     async def start(self, ctx: commands.Context):
         """
-        Setup
-        1. Add New Players
-        2. Assign Discord Roles
-        3. Create Channels
-            a. Channel Permissions
-        4. Assign Game Roles
-        5. Start Game
-            a. Send Roles
-            b. Await Game End
-            c. Vote on Mafia
-            d. Tally Points
-        6. Remove Leaving Players
-        """
-        # Assign Players in join_queue
-        self.game_over = False
-        
-        if not await self._add_queued_players(ctx):
-            return False            
-            
+        Run rounds until players stop or an error happens
+
+        Each phase handler does its work and returns the next phase, or
+        None on an error. The phase is kept on errors and cancellation,
+        so calling start again resumes where the game stopped.
+
+        JOIN      1. Apply Queued Joins and Leaves
+        SETUP     2. Assign Discord Roles
+                  3. Create Channels
+        DEAL      4. Assign Game Roles and send them
+        PLAY      5. Await Game End
+        VOTE      6. Vote on Mafia
+        REVEAL    7. Display Mafia and Tally Points
+        TEARDOWN  8. Apply Queued Joins and Leaves, prompt for another round
+        """
+        if self._task is not None and not self._task.done() and self._task is not asyncio.current_task():
+            await ctx.send("Game is already running!")
+            return True
+
+        if self.phase is Phase.CLOSED:
+            return False
+        if self.phase is Phase.LOBBY:
+            self.phase = Phase.JOIN
+
+        self._task = asyncio.current_task()
+        self._channel = ctx.channel
+        try:
+            while self.phase.running:
+                with self.cog.stats.measure(self.guild.id, self.phase.value):
+                    next_phase = await self._handlers[self.phase](ctx)
+                if next_phase is None:
+                    return False
+                self.phase = next_phase
+                self.dashboard.refresh()
+                self.cog.games.touch(self.guild.id, self.lobby_id)
+                await self.cog.snapshots.save(self)
+        finally:
+            self._task = None
+
+        return True
+
+    async def cancel(self):
+        """
+        Stop the running round, the phase is kept so it can be resumed
+        """
+        if self._task is not None and self._task is not asyncio.current_task():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+
+    def launch(self, ctx) -> Optional[asyncio.Task]:
+        """
+        Run start in its own task, None if the game is running already
+        """
+        if self.active:
+            return None
+        self._task = asyncio.ensure_future(self.start(ctx))
+        return self._task
+
+    def resume(self, channel: discord.TextChannel) -> Optional[asyncio.Task]:
+        """
+        Continue running without a command, what would go to the command's
+        channel goes to channel
+        """
+        return self.launch(ChannelContext(channel))
+
+    def detach(self):
+        """
+        Stop the running round and the queued commands without cleaning
+        up so another instance of the cog can resume it, returns the
+        channel it was running for
+        """
+        self.actor.close()
+        if self._task is None or self._task.done():
+            return None
+
+        self._task.cancel()
+        return self._channel
+
+    async def close_messages(self):
+        """
+        Delete the dashboard and the prompts of the stopped round, a
+        resumed round posts them again
+        """
+        await self.dashboard.close()
+        prompts, self._prompts = self._prompts, []
+        for msg in prompts:
+            try:
+                await msg.delete()
+            except discord.HTTPException:
+                pass
+
+    async def end(self) -> bool:
+        """
+        Stop the game for good and clean up
+        """
+        self.actor.close()
+        await self.cancel()
+        await self.cleanup()
+        self.phase = Phase.CLOSED
+        await self.cog.snapshots.clear(self.guild, self.lobby_id)
+        return True
+
+    @property
+    def key(self):
+        return self.guild.id, self.lobby_id
+
+    @property
+    def started(self) -> bool:
+        return self.phase.in_round
+
+    @property
+    def active(self) -> bool:
+        """
+        Whether rounds are being run, joins and leaves are queued meanwhile
+        """
+        return self._task is not None and not self._task.done()
+
+    @property
+    def game_over(self) -> bool:
+        return self.phase is Phase.CLOSED
+
+    async def _phase_join(self, ctx):
+        # Changes queued before a restart or while the lobby was paused
+        if not await self._apply_queue(ctx):
+            return None
+
         if len(self.players) == 0:
             await ctx.send("No players to start the game!\nJoin the game with `[p]mafia join`")
-            return True
-        
-        self.started = True
+            return Phase.LOBBY
+        return Phase.SETUP
 
+    async def _phase_setup(self, ctx):
         # Create and Assign Discord Role
-        if self.game_role is None:
-            if not await self._create_discord_role(ctx):
-                return False
+        with self.cog.stats.measure(self.guild.id, "discord_roles"):
+            if self.game_role is None:
+                if not await self._create_discord_role(ctx):
+                    return None
+
+            if not await self.assign_all_discord_role(ctx, self.game_role):
+                return None
 
-        if not await self.assign_all_discord_role(ctx, self.game_role):
-            return False
-        
         # Create Channels and their permissions
-        if self.channel_category is None:
-            if not await self._create_category(ctx):
-                return False
+        with self.cog.stats.measure(self.guild.id, "channels"):
+            if self.channel_category is None:
+                if not await self._create_category(ctx):
+                    return None
 
-        if self.village_channel is None:
-            if not await self._create_channel(ctx):
-                return False
-    
+            if self.village_channel is None:
+                if not await self._create_channel(ctx):
+                    return None
+        return Phase.DEAL
+
+    async def _phase_deal(self, ctx):
         # Create and Assign Game Roles
-        if not await self._set_roles():
-            return False
+        if not await self._set_roles(self.game_type):
+            return None
 
         if not await self._assign_roles(self.roles):
-            return False
+            return None
 
-        # Game Itself
         await self._start_round() # Send players the DM
+        return Phase.PLAY
 
+    async def _phase_play(self, ctx):
         await self._wait_for_game(ctx) # Wait for RL Game to Finish
+        return Phase.VOTE
 
+    async def _phase_vote(self, ctx):
         await self._vote_mafia(ctx) # Vote on Mafia
+        return Phase.REVEAL
 
-        await self._end_round(ctx) # Display Mafia and Tally Points 
-        
-        self.started = False
+    async def _phase_reveal(self, ctx):
+        await self._end_round(ctx) # Display Mafia and Tally Points
+        return Phase.TEARDOWN
+
+    async def _phase_teardown(self, ctx):
+        # Apply the round's joins and leaves before asking to continue
+        with self.cog.stats.measure(self.guild.id, "roster_changes"):
+            if not await self._apply_queue(ctx):
+                return None
 
-        # Remove Leaving Players
-        if not await self._remove_leaving_players(ctx):
-            return False
-        
         if await self._prompt_new_game(ctx):
-            await self.start(ctx)
-        else:
-            await self.cleanup()
+            return Phase.JOIN
 
-        return True
+        await self._drop_queue(ctx)
+        await self.cleanup()
+        return Phase.CLOSED
 
     async def join(self, member: discord.Member, channel: discord.TextChannel):
         """
@@ -117,18 +300,27 @@ class Game:
         """
         player = await self.get_player_by_member(member)
 
-        if player is not None:
-            embed = discord.Embed(description=player.mention+" is already in the game!")
-            await channel.send(embed=embed)
+        if self.started or self.active:
+            leaving = self.queue.is_leaving(member)
+            if not self.queue.join(member, player is not None):
+                embed = discord.Embed(description=member.mention+" is already in the game!")
+                await channel.send(embed=embed)
+                return
+            elif leaving:
+                embed = discord.Embed(description=member.mention+" will stay in the game")
+            else:
+                embed = discord.Embed(description="Game has already started. "+member.mention+" will be added at the start of the next round")
+            await self._notify(channel, embed)
+            await self.cog.snapshots.save(self)
             return
 
-        if self.started:
-            embed = discord.Embed(description="Game has already started. "+member.mention+" will be added at the start of the next round")
+        if player is not None:
+            embed = discord.Embed(description=player.mention+" is already in the game!")
             await channel.send(embed=embed)
-            self.join_queue.append(member)
             return
 
         await self._join(member, channel)
+        await self.cog.snapshots.save(self)
 
     async def leave(self, member: discord.Member, channel: discord.TextChannel = None):
         """
@@ -136,227 +328,193 @@ class Game:
         """
         player = await self.get_player_by_member(member)
 
-        if player is None:
-            embed = discord.Embed(description=member.mention+" isn't in the game")
-            await channel.send(embed=embed)
+        if self.started or self.active:
+            joining = self.queue.is_joining(member)
+            if not self.queue.leave(member, player is not None):
+                embed = discord.Embed(description=member.mention+" isn't in the game")
+                await channel.send(embed=embed)
+                return
+            elif joining:
+                embed = discord.Embed(description=member.mention+" will no longer be added next round")
+            else:
+                embed = discord.Embed(description="Game is in progress.\n"+member.mention+" will be removed at the end of the round")
+            await self._notify(channel, embed)
+            await self.cog.snapshots.save(self)
             return
 
-        if self.started:
-            embed = discord.Embed(description="Game is in progress.\n"+player.mention+" will be removed at the end of the round")
+        if player is None:
+            embed = discord.Embed(description=member.mention+" isn't in the game")
             await channel.send(embed=embed)
-            self.leave_queue.append(member)
             return
         
         await self._leave(member, channel)
+        await self.cog.snapshots.save(self)
 
         embed = discord.Embed(description=player.mention+" has left the game")
-        await channel.send(embed=embed)
+        await self._notify(channel, embed)
         
     async def get_player_by_member(self, member):
         """
         Return Player by member
         """
-        for player in self.players:
-            if player.member == member:
-                return player
-        return None
+        return self.players.get(member)
 
     async def assign_all_discord_role(self, ctx, role: discord.Role):
-        try:
-            for player in self.players:
-                if role not in player.member.roles:
-                    await player.member.add_roles(*[role])
-        except discord.Forbidden:
-            await ctx.send("Unable to add role **{}**\nBot is missing `manage_roles` permissions".format(role.name))
-            return False
-        return True
+        members = [player.member for player in self.players]
+        return await self._bulk_add_role(members, ctx.channel, role)
 
     async def assign_member_discord_role(self, member, channel, role: discord.Role):
-        try:
-            if role not in member.roles:
-                await member.add_roles(*[role])
-        except discord.Forbidden:
-            await channel.send("Unable to add role **{}**\nBot is missing `manage_roles` permissions".format(role.name))
+        return await self._bulk_add_role([member], channel, role)
+
+    async def _bulk_add_role(self, members, channel, role: discord.Role):
+        results = await self.cog.role_ops.add(members, role, reason="(BOT)Mafia Game Role")
+        failed = BulkRoleOperator.failed(results)
+
+        if failed:
+            await channel.send("Unable to add role **{}** to {}\n"
+                               "Bot is missing `manage_roles` permissions".format(
+                                   role.name, " ".join(result.member.mention for result in failed)))
             return False
         return True
 
     async def cleanup(self):
-        # Delete Discord stuff
-        await self.game_role.delete(reason="(BOT) Mafia Game Has Ended")
-        await self.village_channel.delete(reason="(BOT) Mafia Game Has Ended")
-        await self.channel_category.delete(reason="(BOT) Mafia Game Has Ended")
+        await self.close_messages()
+
+        # Park or delete Discord stuff
+        if self.village_channel is not None:
+            if await self.cog.config.guild(self.guild).park_resources():
+                await self.cog.role_ops.remove([player.member for player in self.players], self.game_role,
+                                               reason="(BOT) Mafia Game Has Ended")
+                await self.cog.resources.park(self.guild, self.village_channel, self.game_role, self.lobby_id)
+            else:
+                await self.cog.resources.delete(self.guild, self.lobby_id)
 
         # Reset Variables
         self.roles = []
-        self.players = []
-        self.join_queue = []
-        self.leave_queue = []
+        self.players.clear()
+        self.queue.clear()
 
         self.vote_totals = {}
-
-        self.started = False
+        self.tally = None
 
         self.game_role = None
         self.channel_category = None
         self.village_channel = None
         self.game_type = None
+        self.deal_seed = None
 
     async def _leave(self, member, channel):
         """
         Remove Roles and Permisions
         """
-        player = await self.get_player_by_member(member)
-        
-        self.players = [player for player in self.players if player.member != member]
+        self.players.remove(member)
 
         if self.game_role is not None:
-            await member.remove_roles(*[self.game_role])
+            await self.cog.role_ops.remove([member], self.game_role, reason="(BOT) Left Mafia Game")
 
     async def _join(self, member, channel):
         """
         Add Roles and add to game
         """
-        self.players.append(Player(member))
+        self.players.add(member)
         
         if self.game_role is not None:
             await self.assign_member_discord_role(member, channel, self.game_role) 
         
         embed = discord.Embed(description=member.mention+" has joined the game")
-        await channel.send(embed=embed)
+        await self._notify(channel, embed)
 
-    async def _set_roles(self, game_type=None):
+    async def _notify(self, channel, embed):
         """
-        If no game_type game creates the roles based on number of players
+        Post a roster change where the dashboard can't be seen, and refresh it
         """
-        self.roles = []
+        if not self.dashboard.shown_in(channel):
+            await channel.send(embed=embed)
+        self.dashboard.refresh()
+
+    async def _set_roles(self, game_type=None):
+        """
+        Deal the game_type's roles for the number of players in seat order
 
-        if game_type is None:
-            for player_index in range(len(self.players)):
-                if player_index == len(self.players) - 1:
-                    self.roles.append(Godfather())
-                else:
-                    self.roles.append(Town())
+        The seed is kept so a deal can be reproduced from it and the roster
+        """
+        self.deal_seed = random.getrandbits(32)
+        role_classes = self.cog.planner.deal(game_type or DEFAULT_TYPE, len(self.players), self.deal_seed)
+        self.roles = [role_class() for role_class in role_classes]
         return True
 
     async def _assign_roles(self, roles):
-        random.shuffle(roles)
-        self.players.sort(key=lambda player: player.member.display_name.lower())
-
         if len(roles) != len(self.players):
             await self.village_channel.send("Unhandled error - players!=roles")
             return False
 
-        for index, player in enumerate(self.players):
-            await self.players[index].assign_role(roles[index])
+        for index, (player, role) in enumerate(zip(self.players, roles)):
+            await player.assign_role(role)
 
             await player.assign_id(index)
         return True
 
-    async def _add_queued_players(self, ctx):
-        if len(self.join_queue) > 0:
-            for member in self.join_queue:
-                if self.village_channel is not None:
-                    await self._join(member, self.village_channel)
-                else:
-                    await self._join(member, ctx.channel)
-            self.join_queue = []
-        return True
+    async def _apply_queue(self, ctx):
+        """
+        Apply every queued join and leave at once
 
-    async def _remove_leaving_players(self, ctx):
-        if len(self.leave_queue) > 0:
-            for member in self.leave_queue:
-                if self.village_channel is not None:
-                    await self._leave(member, self.village_channel)
-                else:
-                    await self._leave(member, ctx.channel)
-            self.leave_queue = []
+        Costs one bulk role update each way and a single digest message,
+        or a dashboard edit in its channel, however many members came and
+        went during the round.
+        """
+        if len(self.queue) == 0:
+            return True
+
+        joins, leaves = self.queue.take()
+        channel = self.village_channel if self.village_channel is not None else ctx.channel
+
+        for member in leaves:
+            self.players.remove(member)
+        for member in joins:
+            self.players.add(member)
+
+        if self.game_role is not None:
+            if leaves:
+                await self.cog.role_ops.remove(leaves, self.game_role, reason="(BOT) Left Mafia Game")
+            if joins:
+                await self._bulk_add_role(joins, channel, self.game_role)
+
+        embed = discord.Embed(title="Lobby Changes")
+        if joins:
+            embed.add_field(name="Joined", value=" ".join(member.mention for member in joins), inline=False)
+        if leaves:
+            embed.add_field(name="Left", value=" ".join(member.mention for member in leaves), inline=False)
+        await self._notify(channel, embed)
         return True
     
     async def _create_discord_role(self, ctx):
-        for role in ctx.guild.roles:
-            if "Mafia Players" == role.name:
-                self.game_role = role
-                
-                try:
-                    await self.game_role.edit(mentionable=True,
-                                        reason="(BOT)Mafia Game Role")
-                    return True
-                except (discord.Forbidden, discord.HTTPException):
-                    await ctx.send("Unable to edit discord role\nBot is missing `manage_roles` permisions")
-                    return False
-        
         try:
-            self.game_role = await ctx.guild.create_role(name="Mafia Players",
-                                                        mentionable=True,
-                                                        reason="(BOT)Mafia Game Role")
+            self.game_role = await self.cog.resources.role(self.guild, self.lobby_id)
         except (discord.Forbidden, discord.HTTPException):
             await ctx.send("Unable to create discord role\nBot is missing `manage_roles` permisions")
-            return False  
+            return False
         return True
 
     async def _create_category(self, ctx):
-        overwrite = {
-            self.guild.default_role: discord.PermissionOverwrite(read_messages=False, send_messages=False,
-                                                                 add_reactions=False),
-            self.guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True, add_reactions=True,
-                                                       manage_messages=True, manage_channels=True,
-                                                       manage_roles=True, read_message_history=True),
-            self.game_role: discord.PermissionOverwrite(read_messages=True, send_messages=True)
-        }
-
-        for category in ctx.guild.categories:
-            if "Rocket League Mafia" == category.name:
-                self.channel_category = category
-
-                try:
-                    await self.channel_category.edit(overwrites=overwrite, reason="(BOT) New Mafia Game")
-                    return True
-                except discord.Forbidden:
-                    await ctx.send("Unable to modify category **{}**\n"
-                                    "Bot is missing `manage_channels` permissions".format(self.channel_category.name))
-                    return False     
-
         try:
-            self.channel_category = await self.guild.create_category("Rocket League Mafia",
-                                                                    overwrites=overwrite,
-                                                                    reason="(BOT)New Mafia game")
+            self.channel_category = await self.cog.resources.category(self.guild)
         except discord.Forbidden:
             await ctx.send("Unable to add category **{}**\n"
-                            "Bot is missing `manage_channels` permissions".format(self.channel_category.name))
-            return False           
+                            "Bot is missing `manage_channels` permissions".format(CATEGORY_NAME))
+            return False
         return True
 
     async def _create_channel(self, ctx):
-        overwrite = {
-            self.guild.default_role: discord.PermissionOverwrite(read_messages=False, send_messages=False,
-                                                                 add_reactions=False),
-            self.guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True, add_reactions=True,
-                                                       manage_messages=True, manage_channels=True,
-                                                       manage_roles=True, read_message_history=True),
-            self.game_role: discord.PermissionOverwrite(read_messages=True, send_messages=True)
-        }
-
-        for channel in ctx.guild.text_channels:
-            if "village" == channel.name:
-                self.village_channel = channel
-                
-                try:
-                    await self.village_channel.edit(overwrites=overwrite, reason="(BOT) New Mafia Game")
-                    return True
-                except discord.Forbidden:
-                    await ctx.send("Unable to modify category **{}**\n"
-                                    "Bot is missing `manage_channels` permissions".format(self.channel_category.name))
-                    return False
-
         try:
-            self.village_channel = await self.guild.create_text_channel("Village",
-                                                                        overwrites=overwrite,
-                                                                        reason="(BOT) New Mafia Game",
-                                                                        category=self.channel_category)
+            self.village_channel = await self.cog.resources.channel(self.guild, self.channel_category,
+                                                                    self.game_role, self.lobby_id)
         except discord.Forbidden:
             await ctx.send("Unable to add channel **{}**\n"
-                                "Bot is missing `manage_channels` permissions".format(self.channel_category.name))
+                            "Bot is missing `manage_channels` permissions".format(channel_name(self.lobby_id)))
             return False
+
+        self.cog.games.bind_channel(self)
+        await self.dashboard.move(self.village_channel)
         return True
 
     async def _prompt_new_game(self, ctx):
@@ -364,14 +522,37 @@ class Game:
         embed.add_field(name="Select an Option",value="Click ✅ for yes\nClick ❎ for no")
 
         msg = await self.village_channel.send(embed=embed)
+        self._prompts.append(msg)
         start_adding_reactions(msg, ReactionPredicate.YES_OR_NO_EMOJIS)
 
-        pred = ReactionPredicate.yes_or_no(msg)
-        await ctx.bot.wait_for("reaction_add", check=pred)
-        
+        try:
+            emoji, user_id = await self.cog.reactions.wait_for(msg.id, ReactionPredicate.YES_OR_NO_EMOJIS,
+                                                               timeout=PROMPT_TIMEOUT)
+        except asyncio.TimeoutError:
+            emoji = None
+        except MessageDeleted:
+            self._prompts.remove(msg)
+            return False  # A deleted prompt counts as no
+
+        self._prompts.remove(msg)
         await msg.delete()
 
-        return pred.result
+        return emoji == ReactionPredicate.YES_OR_NO_EMOJIS[0]
+
+    async def _drop_queue(self, ctx):
+        """
+        Tell members who asked to join during the prompt that there is no next round
+
+        Queued leaves need no notice, ending the game removes everyone.
+        """
+        joins = self.queue.joining
+        if not joins:
+            return
+
+        embed = discord.Embed(title="Game has ended",
+                              description=" ".join(member.mention for member in joins) +
+                              " won't be added to a next round\nJoin a new game with `[p]mafia join`")
+        await ctx.send(embed=embed)
 
     async def _check_game_over_status(self):
         if self.game_over:
@@ -383,52 +564,143 @@ class Game:
         embed.add_field(name="Mafia's Objective", value="Lose the game without getting caught", inline=False)
 
         await self.village_channel.send(self.game_role.mention, embed=embed)
-        await asyncio.sleep(5)
 
-        tasks = []
-        for player in self.players:
-            tasks.append(asyncio.create_task(player._start_round()))
-        
-        await asyncio.gather(*tasks)
+        with self.cog.stats.measure(self.guild.id, "dm_fanout"):
+            result = await self.cog.dms.send((player.member, player.role_card()) for player in self.players)
+        self.dm_stats = result.stats()
 
-    async def _wait_for_game(self, ctx):
-        # TODO: Seperate Teams
+        if result.failed:
+            embed = discord.Embed(title="Couldn't DM roles to",
+                                  description=" ".join(member.mention for member in result.failed))
+            embed.set_footer(text="Allow direct messages from server members to get your role")
+            await self.village_channel.send(embed=embed)
 
+    async def _wait_for_game(self, ctx):
         embed = discord.Embed(title="Respond with the 🏁 when the game is done")
+        for name, players in self._split_teams():
+            embed.add_field(name=name, value="\n".join(player.mention for player in players), inline=True)
 
         msg = await self.village_channel.send(embed=embed)
+        self._prompts.append(msg)
         start_adding_reactions(msg, "🏁")
 
-        pred = ReactionPredicate.with_emojis(emojis="🏁", message=msg)
-        await ctx.bot.wait_for("reaction_add", check=pred)
- 
+        self.match_started = time.time()
+        self._flag_message_id = msg.id
+        try:
+            await self.cog.reactions.wait_for(msg.id, ("🏁",), timeout=PLAY_TIMEOUT)
+        except asyncio.TimeoutError:
+            pass
+        except MessageDeleted:
+            self._prompts.remove(msg)
+            return  # Deleting the message ends the match like the 🏁
+        finally:
+            self._flag_message_id = None
+
+        self._prompts.remove(msg)
         await msg.delete()
 
+    def end_match(self) -> bool:
+        """
+        End the match as if the 🏁 was added, False if none is being played
+        """
+        if self._flag_message_id is None:
+            return False
+        return self.cog.reactions.resolve(self._flag_message_id, "🏁")
+
+    def _split_teams(self):
+        """
+        Teams balanced on session score with the mafia spread over them
+        """
+        players = list(self.players)
+        team_count = min(self.team_count, len(players))
+        if team_count < 2:
+            return []
+
+        split = split_teams([player.score for player in players], team_count,
+                            [player.role is not None and player.role.alignment == 2 for player in players])
+
+        teams = []
+        for number, team in enumerate(split, 1):
+            members = [players[index] for index in team]
+            name = "Team {} ({})".format(number, sum(player.score for player in members))
+            teams.append((name, members))
+        return teams
+
     async def _vote_mafia(self, ctx):
-        embed = discord.Embed(title="Who do you think is mafia?",
-                             description="Vote for who you think it is with the corresponding emoji")
-        
-        player_list = " "
-        emoji_list = []
-        for index, player in enumerate(self.players):
-            player_list = player_list + str(index + 1) + ". " + player.mention + "\n"
-            if index < 9:
-                emoji_list.append(ReactionPredicate.NUMBER_EMOJIS[index+1])
+        """
+        Post the vote, one message per page of players, and collect
+        reactions through the tally until the countdown ends
+        """
+        self.tally = VoteTally(player.member.id for player in self.players)
 
-        embed.add_field(name="Players", value=player_list, inline=True)
-        embed.add_field(name="You have 15 seconds to vote: ", value="15", inline=False)
+        first_page = None
+        vote_messages = []
+        for start in range(0, len(self.players), VOTE_PAGE_SIZE):
+            page = self.players[start:start + VOTE_PAGE_SIZE]
+            emoji_list = ReactionPredicate.NUMBER_EMOJIS[1:len(page) + 1]
 
-        msg = await self.village_channel.send(embed=embed)
+            player_list = "\n".join(emoji + " " + player.mention for emoji, player in zip(emoji_list, page))
+
+            if first_page is None:
+                embed = discord.Embed(title="Who do you think is mafia?",
+                                      description="Vote for who you think it is with the corresponding emoji")
+                embed.add_field(name="Players", value=player_list, inline=True)
+                embed.add_field(name=VOTE_FIELD, value=str(VOTE_SECONDS), inline=False)
+            else:
+                embed = discord.Embed(description=player_list)
+
+            msg = await self.village_channel.send(embed=embed)
+            self._prompts.append(msg)
+            if first_page is None:
+                first_page = (msg, embed)
 
-        start_adding_reactions(msg, emoji_list)
+            for emoji, player in zip(emoji_list, page):
+                self.tally.add_option(msg.id, emoji, player.member.id)
+            self.cog.reactions.subscribe(msg.id, self.tally.on_reaction)
+            vote_messages.append(msg)
+            start_adding_reactions(msg, emoji_list)
 
-        for time in range(14, -1, -1):
-            await asyncio.sleep(1)
-            embed.remove_field(1)
-            embed.insert_field_at(1, name="You have 15 seconds to vote: ", value=str(time), inline=False)
-            await msg.edit(embed=embed)
+        deadline = time.time() + VOTE_SECONDS
 
-        # TODO: Total up Reactions   
+        try:
+            await self._countdown(*first_page, deadline)
+        finally:
+            for msg in vote_messages:
+                self.cog.reactions.unsubscribe(msg.id)
+
+        # The closed vote stays in the channel as the round's record
+        self._prompts = [msg for msg in self._prompts if msg not in vote_messages]
+        self.vote_totals = self.tally.close()
+
+    async def _countdown(self, msg, embed, deadline):
+        """
+        Count down the vote until deadline
+
+        Edits go through the cog's editor and get coarser as the channel
+        gets busier. When saturated a single relative timestamp is shown
+        instead, which Discord renders as a live countdown for free.
+        """
+        editor = self.cog.editor
+        load = editor.load(msg.channel)
+        step = COUNTDOWN_STEP if load < 0.5 else COUNTDOWN_STEP * 2
+        remaining = VOTE_SECONDS - step
+
+        while remaining > 0 and load < 1.0:
+            await asyncio.sleep(max(0, deadline - remaining - time.time()))
+            load = editor.load(msg.channel)
+            if load < 1.0:
+                embed.set_field_at(1, name=VOTE_FIELD, value=str(remaining), inline=False)
+                editor.submit(msg, embed=embed)
+            remaining -= step
+
+        if load >= 1.0:
+            embed.set_field_at(1, name=VOTE_FIELD, value="Closes <t:{}:R>".format(int(deadline)), inline=False)
+            editor.submit(msg, embed=embed)
+
+        await asyncio.sleep(max(0, deadline - time.time()))
+
+        embed.set_field_at(1, name="Voting is closed", value="0", inline=False)
+        editor.submit(msg, embed=embed)
 
     async def _end_round(self, ctx):
         mafia_players = await self._get_mafia_players()
@@ -440,9 +712,71 @@ class Game:
         embed = discord.Embed(title="The Mafia Was...",
                               description=player_mention)
 
+        for player in self.players:
+            if player.role.alignment == 3:
+                embed.add_field(name=player.role.name, value=player.mention, inline=False)
+
+        votes = ""
+        for player in self.players:
+            if player.member.id in self.vote_totals:
+                votes = votes + player.mention + ": " + str(self.vote_totals[player.member.id]) + "\n"
+        if votes:
+            embed.add_field(name="Votes", value=votes, inline=False)
+
+        points = await self._score_round(mafia_players)
+        scored = ""
+        for player in self.players:
+            if points.get(player.member.id):
+                scored = scored + player.mention + ": +" + str(points[player.member.id]) + "\n"
+        if scored:
+            embed.add_field(name="Points", value=scored, inline=False)
+
+        if self.deal_seed is not None:
+            embed.set_footer(text="{} deal, seed {}".format(self.game_type or DEFAULT_TYPE, self.deal_seed))
+
         await self.village_channel.send(embed=embed)
 
-        # TODO: Score Points and Display
+    async def _score_round(self, mafia_players):
+        """
+        Town scores 1 for voting for a mafia player, mafia score 2 for
+        not being the most voted player and neutrals score 2 for being it
+        """
+        mafia_ids = {player.member.id for player in mafia_players}
+        most_votes = max(self.vote_totals.values(), default=0)
+        caught = {member_id for member_id, votes in self.vote_totals.items() if votes == most_votes}
+        votes = self.tally.votes if self.tally is not None else {}
+
+        points = {}
+        for player in self.players:
+            if player.member.id in mafia_ids:
+                earned = 0 if player.member.id in caught else MAFIA_POINTS
+            elif player.role.alignment == 3:
+                earned = NEUTRAL_POINTS if player.member.id in caught else 0
+            else:
+                earned = TOWN_POINTS if votes.get(player.member.id) in mafia_ids else 0
+            player.score += earned
+            points[player.member.id] = earned
+
+        await self.cog.scores.record(self.guild, points)
+        await self._log_round(points, mafia_ids, caught, votes)
+        return points
+
+    async def _log_round(self, points, mafia_ids, caught, votes):
+        """
+        Append the round to the cog's history, town wins if a mafia player got the most votes
+        """
+        winner = TOWN_WIN if mafia_ids & caught else MAFIA_WIN
+
+        rows = []
+        for player in self.players:
+            member_id = player.member.id
+            alignment = player.role.alignment
+            won = winner == TOWN_WIN if alignment == 1 else points[member_id] > 0
+            rows.append((member_id, votes.get(member_id), alignment, won,
+                         self.vote_totals.get(member_id, 0), points[member_id]))
+
+        await self.cog.history.append(RoundRecord(self.guild.id, self.lobby_id, time.time(), self.deal_seed,
+                                                  winner, rows))
 
     async def _get_mafia_players(self):
         mafia_players = []
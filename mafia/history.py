@@ -0,0 +1,339 @@
+import asyncio
+import json
+import mmap
+import os
+import struct
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import groupby
+from operator import itemgetter
+from typing import Deque, Dict, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+# Segments are rotated once they grow past this many bytes
+SEGMENT_BYTES = 8 * 1024 * 1024
+# Rounds appended between aggregate checkpoints
+CHECKPOINT_ROUNDS = 50
+# Latest rounds per guild whose position is indexed, the most recent() returns
+INDEX_ROUNDS = 100
+
+TOWN_WIN = 1
+MAFIA_WIN = 2
+
+_MAGIC = b"MAFHIST1"
+# record length, guild id, lobby, ended at, deal seed, winner, player count
+_ROUND = struct.Struct("<IQHdIBH")
+# member id, voted for (0 if no vote), alignment, won, votes received, points
+_PLAYER = struct.Struct("<QQBBHH")
+_CHECKPOINT = "aggregates.json"
+_LOCK = "history.lock"
+
+# [member id, voted for, alignment, won, votes received, points]
+PlayerRow = Tuple[int, int, int, bool, int, int]
+
+
+class RoundRecord:
+    """
+    One finished round as stored in the log
+    """
+
+    __slots__ = ("guild_id", "lobby", "ended_at", "seed", "winner", "players")
+
+    def __init__(self, guild_id: int, lobby: int, ended_at: float, seed: int, winner: int,
+                 players: List[PlayerRow]):
+        self.guild_id = guild_id
+        self.lobby = lobby
+        self.ended_at = ended_at
+        self.seed = seed
+        self.winner = winner
+        self.players = players
+
+    def pack(self) -> bytes:
+        body = b"".join(_PLAYER.pack(member_id, voted_for or 0, alignment, won, votes, points)
+                        for member_id, voted_for, alignment, won, votes, points in self.players)
+        return _ROUND.pack(_ROUND.size + len(body), self.guild_id, self.lobby, self.ended_at,
+                           self.seed or 0, self.winner, len(self.players)) + body
+
+    @classmethod
+    def unpack_from(cls, buffer, offset: int) -> "RoundRecord":
+        _length, guild_id, lobby, ended_at, seed, winner, count = _ROUND.unpack_from(buffer, offset)
+        offset += _ROUND.size
+        players = []
+        for _ in range(count):
+            member_id, voted_for, alignment, won, votes, points = _PLAYER.unpack_from(buffer, offset)
+            players.append((member_id, voted_for, alignment, bool(won), votes, points))
+            offset += _PLAYER.size
+        return cls(guild_id, lobby, ended_at, seed, winner, players)
+
+
+class PlayerTotals:
+    """
+    Running totals of one member in one guild
+    """
+
+    __slots__ = ("rounds", "mafia", "votes", "correct", "wins", "points")
+
+    def __init__(self, rounds=0, mafia=0, votes=0, correct=0, wins=0, points=0):
+        self.rounds = rounds
+        self.mafia = mafia
+        self.votes = votes
+        self.correct = correct
+        self.wins = wins
+        self.points = points
+
+    def add(self, row: PlayerRow, mafia_ids):
+        _member_id, voted_for, alignment, won, _votes, points = row
+        self.rounds += 1
+        self.wins += won
+        self.points += points
+        if alignment == 2:
+            self.mafia += 1
+        elif voted_for:
+            self.votes += 1
+            self.correct += voted_for in mafia_ids
+
+    def to_list(self) -> list:
+        return [self.rounds, self.mafia, self.votes, self.correct, self.wins, self.points]
+
+
+class RoundHistory:
+    """
+    Append-only log of finished rounds with per-player totals
+
+    Rounds are packed into fixed-layout binary records and appended to
+    numbered segment files, a new segment is started once the current one
+    passes `segment_bytes`. Reads map segments into memory and only parse
+    the records they return, found through a per-guild index of the
+    latest rounds' positions.
+
+    Player totals and the index are updated as rounds are appended and
+    checkpointed with the log position they cover, so loading only
+    replays the rounds after the checkpoint instead of the whole history.
+    File access runs on one worker thread, off the event loop and in the
+    order it was asked for.
+
+    Bot processes sharing the directory take turns through a file lock.
+    Whoever holds it first replays the rounds others appended since it
+    last looked, so every process's totals and checkpoints cover the
+    whole log. Without fcntl, e.g. on Windows, there is no lock and the
+    directory must not be shared.
+    """
+
+    def __init__(self, directory, segment_bytes: int = SEGMENT_BYTES,
+                 checkpoint_rounds: int = CHECKPOINT_ROUNDS, index_rounds: int = INDEX_ROUNDS):
+        self.directory = str(directory)
+        self.segment_bytes = segment_bytes
+        self.checkpoint_rounds = checkpoint_rounds
+        self.index_rounds = index_rounds
+
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._totals: Dict[Tuple[int, int], PlayerTotals] = {}
+        self._index: Dict[int, Deque[Tuple[int, int]]] = {}  # guild id -> (segment, offset) of its latest rounds
+        self._lock = None
+        self._segment = 0
+        self._offset = 0  # end of the last complete record replayed or appended
+        self._unsaved = 0
+
+    async def open(self):
+        """
+        Load the totals and index, replaying the log after the checkpoint
+        """
+        await self._call(self._open)
+
+    async def append(self, record: RoundRecord):
+        await self._call(self._append, record)
+
+    async def totals(self, guild_id: int, member_id: int) -> Optional[PlayerTotals]:
+        return await self._call(self._get_totals, guild_id, member_id)
+
+    async def recent(self, guild_id: int, count: int) -> List[RoundRecord]:
+        """
+        Last count rounds of the guild, newest first, at most `index_rounds`
+        """
+        return await self._call(self._recent, guild_id, count)
+
+    async def close(self):
+        await self._call(self._close)
+        self._executor.shutdown(wait=False)
+
+    async def _call(self, function, *args):
+        return await asyncio.get_event_loop().run_in_executor(self._executor, function, *args)
+
+    def _append(self, record: RoundRecord):
+        self._open()
+        with self._locked():
+            self._catch_up()
+            if self._offset >= self.segment_bytes:
+                self._rotate()
+
+            offset = self._offset
+            with open(self._path(self._segment), "r+b") as file:
+                # Writing over the end also drops a round cut short by a crash
+                file.seek(offset)
+                file.write(record.pack())
+                file.truncate()
+                self._offset = file.tell()
+            self._aggregate(record, self._segment, offset)
+
+            self._unsaved += 1
+            if self._unsaved >= self.checkpoint_rounds:
+                self._checkpoint()
+
+    def _get_totals(self, guild_id: int, member_id: int) -> Optional[PlayerTotals]:
+        self._open()
+        with self._locked():
+            self._catch_up()
+        return self._totals.get((guild_id, member_id))
+
+    def _recent(self, guild_id: int, count: int) -> List[RoundRecord]:
+        self._open()
+        found: List[RoundRecord] = []
+        with self._locked():
+            self._catch_up()
+            positions = list(self._index.get(guild_id, ()))[-count:]
+
+            for segment, newest in groupby(reversed(positions), key=itemgetter(0)):
+                with open(self._path(segment), "rb") as file, \
+                        mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                    found.extend(RoundRecord.unpack_from(buffer, offset) for _segment, offset in newest)
+        return found
+
+    def _checkpoint(self):
+        """
+        Save the totals, the index and the log position they cover, with the lock held
+        """
+        data = {
+            "segment": self._segment,
+            "offset": self._offset,
+            "players": [[guild_id, member_id] + totals.to_list()
+                        for (guild_id, member_id), totals in self._totals.items()],
+            "index": [[guild_id, [list(position) for position in positions]]
+                      for guild_id, positions in self._index.items()]
+        }
+        path = os.path.join(self.directory, _CHECKPOINT)
+        temporary = "{}.{}.tmp".format(path, os.getpid())
+        with open(temporary, "w") as file:
+            json.dump(data, file, separators=(",", ":"))
+        os.replace(temporary, path)
+        self._unsaved = 0
+
+    def _close(self):
+        if self._lock is not None:
+            with self._locked():
+                self._catch_up()
+                self._checkpoint()
+            self._lock.close()
+            self._lock = None
+
+    def _open(self):
+        if self._lock is not None:
+            return
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._lock = open(os.path.join(self.directory, _LOCK), "a+b")
+        with self._locked():
+            segments = self._segments()
+            self._segment, self._offset = self._load_checkpoint(segments)
+            if segments:
+                self._catch_up()
+            else:
+                self._rotate()
+
+    @contextmanager
+    def _locked(self):
+        if fcntl is None:
+            yield
+            return
+
+        fcntl.flock(self._lock.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock.fileno(), fcntl.LOCK_UN)
+
+    def _catch_up(self):
+        """
+        Replay the rounds appended after the position already covered,
+        by this process or any other, with the lock held
+        """
+        for number in self._segments():
+            if number < self._segment:
+                continue
+            if number > self._segment:
+                self._segment, self._offset = number, len(_MAGIC)
+            for start, end, record in self._records(number, self._offset):
+                self._aggregate(record, number, start)
+                self._offset = end
+
+    def _rotate(self):
+        self._segment = self._segment + 1 if self._segment else 1
+        with open(self._path(self._segment), "wb") as file:
+            file.write(_MAGIC)
+        self._offset = len(_MAGIC)
+        self._checkpoint()
+
+    def _aggregate(self, record: RoundRecord, segment: int, offset: int):
+        positions = self._index.get(record.guild_id)
+        if positions is None:
+            positions = self._index[record.guild_id] = deque(maxlen=self.index_rounds)
+        positions.append((segment, offset))
+
+        mafia_ids = {row[0] for row in record.players if row[2] == 2}
+        for row in record.players:
+            totals = self._totals.get((record.guild_id, row[0]))
+            if totals is None:
+                totals = self._totals[(record.guild_id, row[0])] = PlayerTotals()
+            totals.add(row, mafia_ids)
+
+    def _load_checkpoint(self, segments: Sequence[int]) -> Tuple[int, int]:
+        """
+        Totals and index from the last checkpoint, returns the log position they cover
+        """
+        try:
+            with open(os.path.join(self.directory, _CHECKPOINT)) as file:
+                data = json.load(file)
+        except (OSError, ValueError):
+            data = None
+
+        if data is None or data["segment"] not in segments or "index" not in data:
+            # No usable checkpoint, rebuild from the first segment
+            self._totals = {}
+            self._index = {}
+            return (segments[0] if segments else 0), len(_MAGIC)
+
+        self._totals = {(guild_id, member_id): PlayerTotals(*totals)
+                        for guild_id, member_id, *totals in data["players"]}
+        self._index = {guild_id: deque((tuple(position) for position in positions), maxlen=self.index_rounds)
+                       for guild_id, positions in data["index"]}
+        return data["segment"], data["offset"]
+
+    def _records(self, segment: int, start: int) -> Iterator[Tuple[int, int, RoundRecord]]:
+        """
+        Complete records of a segment from start, with the offsets they start and end at
+        """
+        with open(self._path(segment), "rb") as file:
+            if os.fstat(file.fileno()).st_size <= start:
+                return
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                offset = start
+                while offset + _ROUND.size <= len(buffer):
+                    length = _ROUND.unpack_from(buffer, offset)[0]
+                    if length < _ROUND.size or offset + length > len(buffer):
+                        break
+                    record = RoundRecord.unpack_from(buffer, offset)
+                    yield offset, offset + length, record
+                    offset += length
+
+    def _segments(self) -> List[int]:
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(int(name[:-4]) for name in os.listdir(self.directory)
+                      if name.endswith(".seg") and name[:-4].isdigit())
+
+    def _path(self, segment: int) -> str:
+        return os.path.join(self.directory, "{:08d}.seg".format(segment))
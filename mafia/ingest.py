@@ -0,0 +1,211 @@
+import asyncio
+import ctypes
+import ctypes.util
+import logging
+import os
+import struct
+from typing import Awaitable, BinaryIO, Callable, Dict, Tuple
+
+log = logging.getLogger("red.mafia.ingest")
+
+# Seconds between directory scans when inotify isn't available
+POLL_INTERVAL = 5
+REPLAY_SUFFIX = ".replay"
+# Replay headers are a few KiB, anything claiming more is not a replay
+MAX_HEADER = 1 << 20
+
+_IN_CLOSE_WRITE = 0x00000008
+_IN_MOVED_TO = 0x00000080
+_EVENT = struct.Struct("iIII")
+
+
+class _Header:
+    """
+    Reader over the header section of a replay, never past its end
+    """
+
+    __slots__ = ("file", "left")
+
+    def __init__(self, file: BinaryIO, size: int):
+        self.file = file
+        self.left = size
+
+    def read(self, size: int) -> bytes:
+        if size < 0 or size > self.left:
+            raise ValueError("Replay header is truncated")
+        data = self.file.read(size)
+        if len(data) != size:
+            raise ValueError("Replay header is truncated")
+        self.left -= size
+        return data
+
+    def unpack(self, fmt: str):
+        return struct.unpack("<" + fmt, self.read(struct.calcsize("<" + fmt)))[0]
+
+    def string(self) -> str:
+        length = self.unpack("i")
+        if length < 0:
+            return self.read(-length * 2).decode("utf-16-le").rstrip("\0")
+        return self.read(length).decode("latin-1").rstrip("\0")
+
+    def properties(self) -> dict:
+        properties = {}
+        while True:
+            name = self.string()
+            if name == "None":
+                return properties
+
+            kind = self.string()
+            size = self.unpack("q")
+            if kind == "IntProperty":
+                value = self.unpack("i")
+            elif kind in ("StrProperty", "NameProperty"):
+                value = self.string()
+            elif kind == "FloatProperty":
+                value = self.unpack("f")
+            elif kind == "QWordProperty":
+                value = self.unpack("Q")
+            elif kind == "BoolProperty":
+                value = bool(self.unpack("B"))
+            elif kind == "ByteProperty":
+                value = self.string()
+                if value not in ("OnlinePlatform_Steam", "OnlinePlatform_PS4"):
+                    value = self.string()
+            elif kind == "ArrayProperty":
+                value = [self.properties() for _ in range(self.unpack("i"))]
+            else:
+                self.read(size)
+                continue
+            properties[name] = value
+
+
+def read_replay_header(path: str) -> dict:
+    """
+    Match details from a Rocket League replay's header
+
+    Only the header section at the start of the file is read, however
+    large the replay is. Raises ValueError if it isn't a replay.
+    """
+    with open(path, "rb") as file:
+        start = file.read(8)
+        if len(start) != 8:
+            raise ValueError("Not a replay")
+        size, _crc = struct.unpack("<iI", start)
+        if not 0 < size <= MAX_HEADER:
+            raise ValueError("Not a replay")
+
+        header = _Header(file, size)
+        major, minor = header.unpack("I"), header.unpack("I")
+        if major >= 868 and minor >= 18:
+            header.unpack("I")  # Net version
+        header.string()  # Replay class, e.g. TAGame.Replay_Soccar_TA
+        properties = header.properties()
+
+    return {
+        "players": [stats.get("Name", "") for stats in properties.get("PlayerStats", [])],
+        "team_scores": (properties.get("Team0Score", 0), properties.get("Team1Score", 0)),
+        "date": properties.get("Date"),
+        "recorded_by": properties.get("PlayerName")
+    }
+
+
+class MatchWatcher:
+    """
+    Reports every replay that is finished writing in a directory
+
+    Uses inotify where the platform has it, so a new replay is seen the
+    moment it is closed. Elsewhere the directory is scanned every
+    `poll_interval` seconds and a file counts as finished once its size
+    stayed the same between two scans. Files there at start are skipped.
+    """
+
+    def __init__(self, directory: str, on_replay: Callable[[str], Awaitable[None]],
+                 poll_interval: float = POLL_INTERVAL):
+        self.directory = directory
+        self.on_replay = on_replay
+        self.poll_interval = poll_interval
+
+    async def run(self):
+        """
+        Watch until cancelled
+        """
+        try:
+            fd = self._inotify()
+        except (AttributeError, OSError):
+            await self._poll()
+        else:
+            try:
+                await self._watch(fd)
+            finally:
+                os.close(fd)
+
+    def _inotify(self) -> int:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if libc.inotify_add_watch(fd, os.fsencode(self.directory), _IN_CLOSE_WRITE | _IN_MOVED_TO) < 0:
+            os.close(fd)
+            raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+        return fd
+
+    async def _watch(self, fd: int):
+        loop = asyncio.get_event_loop()
+        names: asyncio.Queue = asyncio.Queue()
+
+        def readable():
+            try:
+                data = os.read(fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            offset = 0
+            while offset + _EVENT.size <= len(data):
+                _wd, _mask, _cookie, length = _EVENT.unpack_from(data, offset)
+                name = data[offset + _EVENT.size:offset + _EVENT.size + length].rstrip(b"\0")
+                offset += _EVENT.size + length
+                names.put_nowait(os.fsdecode(name))
+
+        loop.add_reader(fd, readable)
+        try:
+            while True:
+                name = await names.get()
+                if name.endswith(REPLAY_SUFFIX):
+                    await self._report(os.path.join(self.directory, name))
+        finally:
+            loop.remove_reader(fd)
+
+    async def _poll(self):
+        seen = self._scan()
+        done = set(seen)
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            current = self._scan()
+            for name, stat in current.items():
+                if name not in done and seen.get(name) == stat:
+                    done.add(name)
+                    await self._report(os.path.join(self.directory, name))
+            done &= set(current)
+            seen = current
+
+    def _scan(self) -> Dict[str, Tuple[int, float]]:
+        try:
+            with os.scandir(self.directory) as entries:
+                return {entry.name: (entry.stat().st_size, entry.stat().st_mtime) for entry in entries
+                        if entry.name.endswith(REPLAY_SUFFIX) and entry.is_file()}
+        except OSError:
+            return {}
+
+    async def _report(self, path: str):
+        try:
+            await self.on_replay(path)
+        except Exception:
+            # A bad replay must not stop the watcher
+            log.exception("Failed to ingest %s", path)
+
+
+def match_players(header: dict, names) -> int:
+    """
+    How many of the replay's players are among names, compared case-insensitively
+    """
+    names = {name.lower() for name in names}
+    return sum(1 for player in header["players"] if player.lower() in names)
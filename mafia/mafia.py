@@ -1,40 +1,133 @@
 import discord
 import asyncio
+import logging
+import os
+import time
 
 from redbot.core import Config, checks, commands
-from redbot.core.utils.predicates import ReactionPredicate
-from redbot.core.utils.menus import start_adding_reactions
+from redbot.core.data_manager import cog_data_path
+from redbot.core.utils.chat_formatting import box
 
-from typing import Any
+from typing import Any, Optional
 
-from .game import Game
+from .actor import MailboxStats
+from .bulk import BulkRoleOperator
+from .composition import CompositionPlanner
+from .dispatch import ReactionDispatcher
+from .editor import MessageEditor
+from .fanout import DMFanout
+from .history import TOWN_WIN, RoundHistory
+from .ingest import MatchWatcher, match_players, read_replay_header
+from .registry import GameRegistry
+from .resources import DEFAULT_LOBBY, ResourceResolver
+from .scores import ScoreLedger
+from .snapshot import SnapshotStore, dump_game, load_game
+from .state import ConfigState, SQLiteState
+from .stats import RoundStats
 
 Cog: Any = getattr(commands, "Cog", object)
 
+log = logging.getLogger("red.mafia")
+
+# Seconds between sweeps for parked resources past their TTL
+COLLECT_INTERVAL = 3600
+# Seconds between sweeps for idle lobbies
+SWEEP_INTERVAL = 60
+# Seconds between writes of the Prometheus metrics file
+METRICS_INTERVAL = 60
+# Games that can run at once in one guild, each in its own channel
+MAX_LOBBIES = 10
+# Bot attribute live games wait in while the cog reloads
+HANDOFF = "_mafia_handoff"
+# Seconds a handoff stays valid, later loads restore from snapshots instead
+HANDOFF_TTL = 60
+
+CLAIMED = "This server's games are run by another bot process, try again in a few minutes"
+
 class Mafia(Cog):
     """
     Main to host Rocket Leauge Mafia on guild
     """
 
-    def __init__(self):
+    def __init__(self, bot):
+        self.bot = bot
         self.config = Config.get_conf(self, identifier=926792766, force_registration=True)
-        default_global = {}
+        default_global = {
+            "resource_ttl": 7 * 24 * 3600,
+            "snapshot_guilds": [],
+            "ingest_dir": None,
+            "state_db": None
+        }
         default_guild = {
             "role_id": None,
             "category_id": None,
-            "channel_id": None
+            "channel_id": None,
+            "parked_at": None,
+            "park_resources": True,
+            "scores": {},
+            "snapshot": None,
+            "lobbies": {}
         }
 
         self.config.register_global(**default_global)
         self.config.register_guild(**default_guild)
 
-        self.games = {}
+        self.state = ConfigState(self.config)
+        self.games = GameRegistry()
+        self.mailboxes = MailboxStats()
+        self.editor = MessageEditor()
+        self.role_ops = BulkRoleOperator()
+        self.planner = CompositionPlanner()
+        self.resources = ResourceResolver(self.config, self.state)
+        self.reactions = ReactionDispatcher(bot)
+        self.dms = DMFanout()
+        self.scores = ScoreLedger(self.state)
+        self.stats = RoundStats()
+        self.snapshots = SnapshotStore(self.state)
+        self.history = RoundHistory(cog_data_path(self) / "history")
+        self.stats.install(bot)
+        self._claimed = set()
+
+        self._collect_task = asyncio.create_task(self._collect_parked())
+        self._sweep_task = asyncio.create_task(self._sweep_games())
+        self._scores_task = asyncio.create_task(self.scores.run())
+        self._metrics_task = asyncio.create_task(self._write_metrics())
+        self._ingest_task = asyncio.create_task(self._ingest_replays())
+        self._state_task = asyncio.create_task(self.state.run())
+
+    async def initialize(self):
+        """
+        Switch to the shared SQLite store if one is configured, load the
+        round history and resume games a previous instance handed off
+        """
+        handed_at, handoff, closing = getattr(self.bot, HANDOFF, (0, [], None))
+        if hasattr(self.bot, HANDOFF):
+            delattr(self.bot, HANDOFF)
+        if closing is not None:
+            # Its leases, snapshots and history files are the previous instance's until it has closed
+            await asyncio.wait([closing])
+
+        path = await self.config.state_db()
+        if path is not None:
+            self._state_task.cancel()
+            self.state = SQLiteState(path)
+            self.resources.state = self.scores.state = self.snapshots.state = self.state
+            self._state_task = asyncio.create_task(self.state.run())
+
+        await self.history.open()
+        await self._take_games(handed_at, handoff)
+
+    def cog_unload(self):
+        self._collect_task.cancel()
+        self._sweep_task.cancel()
+        self._metrics_task.cancel()
+        self._ingest_task.cancel()
+        self.stats.uninstall()
+        self.reactions.close()
+        self._hand_off_games()
+
+    __unload = cog_unload
 
-    def __unload(self):
-        print("Unload called")
-        for game in self.games.values():
-            del game
-    
     @commands.group()
     async def mafia(self, ctx: commands.Context):
         """
@@ -45,117 +138,659 @@ class Mafia(Cog):
 
     @commands.guild_only()
     @mafia.command(name="new")
-    async def mafia_new(self, ctx: commands.Context):
+    async def mafia_new(self, ctx: commands.Context, game_type: str = None):
         """
-        Create new game to join
+        Create new game to join, optionally with a game type's roles
         """
+        if game_type is not None and game_type not in self.planner.compositions:
+            await ctx.send("Unknown game type! Choose from: " + ", ".join(self.planner.types))
+            return
+
         game = await self._new_game(ctx)
 
         if game is None:
             await ctx.send("Failed to create a new game")
-        elif game.started:
-            await ctx.send("Game is in progress! To join use `[p]mafia join`\n"
-                            "You will be added at the start of the next round")
+        elif game.phase.running:
+            message = ("Game is in progress! To join use `[p]mafia join {}`\n"
+                       "You will be added at the start of the next round".format(game.lobby_id))
+            if game_type is not None:
+                message = message + "\nThe game type can't be changed until this game ends"
+            await ctx.send(message)
         else:
-            await ctx.send("Game is ready to join! You can join with `[p]mafia join`")
+            if game_type is not None:
+                game.game_type = game_type
+            await self._show_dashboard(ctx, game)
 
     @commands.guild_only()
     @mafia.command(name="join")
-    async def mafia_join(self, ctx: commands.Context):
+    async def mafia_join(self, ctx: commands.Context, lobby: int = None):
         """
         Joins a game of Mafia
-        """   
-        game = await self._get_game(ctx)
+        """
+        game = await self._get_game(ctx, lobby, "No game to join!\nCreate a new one with `[p]mafia new`",
+                                   reopen=True)
 
         if game is None:
-            await ctx.send("No game to join!\nCreate a new one with `[p]mafia new`")
             return
 
-        await game.join(ctx.author, ctx.channel)
+        await game.actor.ask("join", ctx.author.id, lambda: game.join(ctx.author, ctx.channel))
 
     @commands.guild_only()
     @mafia.command(name="leave")
-    async def mafia_quit(self, ctx: commands.Context, member:discord.Member=None):
+    async def mafia_quit(self, ctx: commands.Context, member: Optional[discord.Member] = None,
+                         lobby: int = None):
         """
         Quit a game of Mafia
         """
-        game = await self._get_game(ctx)
+        game = await self._get_game(ctx, lobby, "No game to quit!")
 
         if game is None:
-            await ctx.send("No game to quit!")
             return
-        
-        if member is None:
-            await game.leave(ctx.author, ctx.channel)
-        else:
-            await game.leave(member, ctx.channel)
+
+        member = member or ctx.author
+        await game.actor.ask("leave", member.id, lambda: game.leave(member, ctx.channel))
 
     @commands.guild_only()
     @mafia.command(name="start")
-    async def mafia_start(self, ctx: commands.Context):
+    async def mafia_start(self, ctx: commands.Context, lobby: int = None):
         """
         Attempts to start the game
         """
-        game = await self._get_game(ctx)
+        game = await self._get_game(ctx, lobby, "No game to start!\nCreate a new one with `[p]mafia new`",
+                                   reopen=True)
 
         if game is None:
-            await ctx.send("No game to start!\nCreate a new one with `[p]mafia new`")
             return
 
-        if not await game.start(ctx):
+        async def launch():
+            task = game.launch(ctx)
+            if task is None:
+                await ctx.send("Game is already running!")
+            return task
+
+        # Starts sent at the same moment share one run of the game
+        task = await game.actor.ask("start", None, launch)
+        if task is None:
+            return
+
+        if not await task:
             await ctx.send("Unhandled Error - check previous messages for issues")
             return
 
-# TODO: Need to find a good way to do this
-#    @commands.guild_only()
-#    @mafia.command(name="end")
-#    async def mafia_end(self, ctx: commands.Context):
-#        """
-#        Attempts to end the game
-#        """
+    @commands.guild_only()
+    @mafia.command(name="teams")
+    async def mafia_teams(self, ctx: commands.Context, count: int, lobby: int = None):
+        """
+        Number of Rocket League teams to split players into, 1 to not split
+        """
+        missing = "No game to set teams for!\nCreate a new one with `[p]mafia new`"
+        game = await self._get_game(ctx, lobby, missing)
+
+        if game is None:
+            return
+        if game.game_over:
+            await ctx.send(missing)
+            return
+
+        if not 1 <= count <= 4:
+            await ctx.send("Teams must be between 1 and 4")
+            return
+
+        game.team_count = count
+        await ctx.send("Players will be split into {} teams from the next match".format(count))
+
+    @checks.is_owner()
+    @mafia.command(name="stats")
+    async def mafia_stats(self, ctx: commands.Context, scope: str = "all"):
+        """
+        Show live games, memory use and time spent per round stage
+
+        Use `[p]mafia stats guild` for the stages of this server only
+        """
+        stats = self.games.stats()
+
+        if scope == "guild" and ctx.guild is not None:
+            stages = self.stats.table(ctx.guild.id)
+        else:
+            stages = self.stats.table()
+
+        embed = discord.Embed(title="Mafia Stats", description=box(stages))
+        embed.add_field(name="Games", value="{games} ({running} running, {lobbies} in lobby)".format(**stats))
+        embed.add_field(name="Players", value=str(stats["players"]))
+        embed.add_field(name="Memory", value="~{:.1f} KiB".format(stats["approx_bytes"] / 1024))
+
+        dms = self.dms.recent()
+        embed.add_field(name="Role DMs", value="{rounds} rounds, p50 {p50:.2f}s, p95 {p95:.2f}s, "
+                                               "{failed} failed".format(**dms), inline=False)
+
+        mail = self.mailboxes.recent()
+        embed.add_field(name="Command Mailboxes", value="{letters} run, {coalesced} coalesced, {depth} waiting "
+                                                        "(max {max_depth}), wait p50 {p50:.3f}s, "
+                                                        "p95 {p95:.3f}s".format(**mail), inline=False)
+        await ctx.send(embed=embed)
+
+    @checks.is_owner()
+    @mafia.command(name="ingest")
+    async def mafia_ingest(self, ctx: commands.Context, directory: str = None):
+        """
+        Watch a directory for Rocket League replays to end matches automatically
+
+        A replay whose players are in a game's match ends that match, the 🏁
+        still works too. Run without a directory to stop watching
+        """
+        if directory is not None and not os.path.isdir(directory):
+            await ctx.send("`{}` isn't a directory".format(directory))
+            return
+
+        await self.config.ingest_dir.set(directory)
+        self._ingest_task.cancel()
+        self._ingest_task = asyncio.create_task(self._ingest_replays())
+
+        if directory is None:
+            await ctx.send("Stopped watching for replays")
+        else:
+            await ctx.send("Matches will end when their replay is saved to `{}`".format(directory))
+
+    @checks.is_owner()
+    @mafia.command(name="statedb")
+    async def mafia_statedb(self, ctx: commands.Context, path: str = None):
+        """
+        Share scores, lobbies and resources with other bot processes through a SQLite file
+
+        Every process must use the same path, a server's games run in the
+        process that claimed it first. Takes effect when the cog is
+        reloaded, run without a path to keep state in Config again
+        """
+        if path is not None and not os.path.isdir(os.path.dirname(os.path.abspath(path))):
+            await ctx.send("The directory of `{}` doesn't exist".format(path))
+            return
+
+        await self.config.state_db.set(path)
+
+        if path is None:
+            await ctx.send("Game state will be kept in Config after the cog is reloaded")
+        else:
+            await ctx.send("Game state will be shared through `{}` after the cog is reloaded".format(path))
+
+    @commands.guild_only()
+    @checks.admin_or_permissions(manage_guild=True)
+    @mafia.command(name="park")
+    async def mafia_park(self, ctx: commands.Context, enabled: bool):
+        """
+        Keep game role and channels hidden between games instead of deleting them
+        """
+        await self.config.guild(ctx.guild).park_resources.set(enabled)
+
+        if enabled:
+            await ctx.send("Game resources will be parked between games")
+        else:
+            await ctx.send("Game resources will be deleted after every game")
+
+    @commands.guild_only()
+    @checks.admin_or_permissions(manage_guild=True)
+    @mafia.command(name="pool")
+    async def mafia_pool(self, ctx: commands.Context, size: int):
+        """
+        Keep channels and roles for this many lobbies ready ahead of demand
+
+        Parked lobbies beyond the size are deleted, busy ones are left alone
+        """
+        if not 1 <= size <= MAX_LOBBIES:
+            await ctx.send("Pool size must be between 1 and {}".format(MAX_LOBBIES))
+            return
+
+        busy = {lobby for lobby, game in self.games.lobbies(ctx.guild.id).items() if not game.game_over}
+        slots = await self.resources.slots(ctx.guild)
+        try:
+            for lobby in range(DEFAULT_LOBBY, DEFAULT_LOBBY + size):
+                if lobby not in slots and lobby not in busy:
+                    await self.resources.provision(ctx.guild, lobby)
+            for lobby, parked_at in slots.items():
+                if lobby >= DEFAULT_LOBBY + size and parked_at is not None and lobby not in busy:
+                    await self.resources.delete(ctx.guild, lobby)
+        except discord.Forbidden:
+            await ctx.send("Unable to manage lobby channels\n"
+                           "Bot is missing `manage_channels` or `manage_roles` permissions")
+            return
+
+        await ctx.send("{} lobbies are ready".format(size))
+
+    @commands.guild_only()
+    @mafia.command(name="lobbies")
+    async def mafia_lobbies(self, ctx: commands.Context):
+        """
+        List the games of this server
+        """
+        if not self.games.lobbies(ctx.guild.id):
+            await self._restore_games(ctx.guild)
+
+        lobbies = ""
+        for lobby, game in sorted(self.games.lobbies(ctx.guild.id).items()):
+            if game.game_over:
+                continue
+            channel = game.village_channel.mention if game.village_channel is not None else "no channel yet"
+            lobbies = lobbies + "**{}** - {} - {} players, {}\n".format(lobby, channel, len(game.players),
+                                                                        game.phase.value)
+
+        if not lobbies:
+            await ctx.send("No games!\nCreate a new one with `[p]mafia new`")
+            return
+
+        embed = discord.Embed(title="Mafia Lobbies", description=lobbies)
+        await ctx.send(embed=embed)
+
+    @commands.guild_only()
+    @mafia.command(name="end")
+    async def mafia_end(self, ctx: commands.Context, lobby: int = None):
+        """
+        Attempts to end the game
+        """
+        game = await self._get_game(ctx, lobby, "No game to end!")
+
+        if game is None:
+            return
+        if game.game_over:
+            await ctx.send("No game to end!")
+            return
+
+        # A game that closed or was handed off meanwhile refuses the end
+        if await game.actor.ask("end", None, game.end):
+            await ctx.send("Game has ended")
+        else:
+            await ctx.send("No game to end!")
+
+    @commands.guild_only()
+    @mafia.command(name="leaderboard")
+    async def mafia_leaderboard(self, ctx: commands.Context, count: int = 10):
+        """
+        Show the top scoring players of this server
+        """
+        board = await self.scores.board(ctx.guild)
+        top = board.top(max(1, min(count, 25)))
+
+        if not top:
+            await ctx.send("Nobody has scored yet!")
+            return
+
+        leaders = ""
+        for position, (member_id, score) in enumerate(top, start=1):
+            member = ctx.guild.get_member(member_id)
+            name = member.mention if member is not None else "<@{}>".format(member_id)
+            leaders = leaders + str(position) + ". " + name + " - " + str(score) + "\n"
+
+        embed = discord.Embed(title="Mafia Leaderboard", description=leaders)
+        await ctx.send(embed=embed)
+
+    @commands.guild_only()
+    @mafia.command(name="rank")
+    async def mafia_rank(self, ctx: commands.Context, member: discord.Member = None):
+        """
+        Show the score and rank of a player
+        """
+        member = member or ctx.author
+        board = await self.scores.board(ctx.guild)
+        rank = board.rank(member.id)
+
+        if rank is None:
+            embed = discord.Embed(description=member.mention + " hasn't scored yet")
+        else:
+            embed = discord.Embed(description="{} is ranked **#{}** of {} with {} points".format(
+                member.mention, rank, len(board), board.score(member.id)))
+        await ctx.send(embed=embed)
+
+    @commands.guild_only()
+    @mafia.command(name="history")
+    async def mafia_history(self, ctx: commands.Context, count: int = 5):
+        """
+        Show the last rounds played on this server
+        """
+        rounds = await self.history.recent(ctx.guild.id, max(1, min(count, 10)))
+
+        if not rounds:
+            await ctx.send("No rounds have been played yet!")
+            return
+
+        embed = discord.Embed(title="Mafia History")
+        for record in rounds:
+            mafia = " ".join("<@{}>".format(row[0]) for row in record.players if row[2] == 2) or "nobody"
+            name = "Lobby {} - {} won".format(record.lobby, "Town" if record.winner == TOWN_WIN else "Mafia")
+            embed.add_field(name=name, value="<t:{}:R>, {} players, mafia: {}".format(
+                int(record.ended_at), len(record.players), mafia), inline=False)
+        await ctx.send(embed=embed)
+
+    @commands.guild_only()
+    @mafia.command(name="profile")
+    async def mafia_profile(self, ctx: commands.Context, member: discord.Member = None):
+        """
+        Show a player's record over every round played on this server
+        """
+        member = member or ctx.author
+        totals = await self.history.totals(ctx.guild.id, member.id)
+
+        if totals is None:
+            await ctx.send(embed=discord.Embed(description=member.mention + " hasn't played a round yet"))
+            return
+
+        embed = discord.Embed(title="Mafia Profile", description=member.mention)
+        embed.add_field(name="Rounds", value=str(totals.rounds))
+        embed.add_field(name="Wins", value="{} ({:.0%})".format(totals.wins, totals.wins / totals.rounds))
+        embed.add_field(name="Mafia", value="{} ({:.0%})".format(totals.mafia, totals.mafia / totals.rounds))
+        if totals.votes:
+            embed.add_field(name="Correct Votes", value="{} of {} ({:.0%})".format(
+                totals.correct, totals.votes, totals.correct / totals.votes))
+        else:
+            embed.add_field(name="Correct Votes", value="No votes yet")
+        embed.add_field(name="Points", value=str(totals.points))
+        await ctx.send(embed=embed)
 
     @commands.guild_only()
     @mafia.command(name="players")
-    async def mafia_players(self, ctx: commands.Context):
+    async def mafia_players(self, ctx: commands.Context, lobby: int = None):
         """
         Get Players of current game
+
+        Refreshes the game's dashboard, a new message is only sent outside
+        the dashboard's channel
         """
-        string_mention = " "
-        game = await self._get_game(ctx)
+        game = await self._get_game(ctx, lobby, "No game to show players of!")
 
-        for player in game.players:
-            string_mention = string_mention + player.mention + " "
+        if game is None:
+            return
 
-        embed = discord.Embed(title="Players in the game", description=string_mention)
-        await ctx.send(embed=embed)
+        await self._show_dashboard(ctx, game)
         
-    async def _get_game(self, ctx: commands.Context):
+    @Cog.listener()
+    async def on_raw_reaction_add(self, payload: discord.RawReactionActionEvent):
+        await self._on_guild_event(payload.guild_id, payload.channel_id)
+        self.reactions.dispatch(payload)
+
+    @Cog.listener()
+    async def on_raw_reaction_remove(self, payload: discord.RawReactionActionEvent):
+        await self._on_guild_event(payload.guild_id, payload.channel_id)
+        self.reactions.dispatch(payload)
+
+    async def _on_guild_event(self, guild_id, channel_id):
+        """
+        Mark the channel's game active, restoring the guild's games first
+        after a restart
+        """
+        if guild_id is None:
+            return
+
+        if self.games.by_channel(channel_id) is None and not self.games.lobbies(guild_id):
+            if await self.snapshots.has_snapshot(guild_id):
+                guild = self.bot.get_guild(guild_id)
+                if guild is not None:
+                    await self._restore_games(guild)
+
+    async def _restore_games(self, guild: discord.Guild):
+        if not await self._claim(guild):
+            return []
+
+        games = await self.snapshots.restore(guild, self)
+        for game in games:
+            await self.games.add(game)
+        return games
+
+    async def _claim(self, guild: discord.Guild) -> bool:
+        """
+        Run the guild's games in this process, False if another process does
+        """
+        if not await self.state.acquire(guild.id):
+            self._claimed.discard(guild.id)
+            return False
+
+        if guild.id not in self._claimed:
+            # Caches from an earlier claim may be stale, another process could have run games since
+            self._claimed.add(guild.id)
+            self.resources.forget(guild.id)
+            self.scores.forget(guild.id)
+        return True
+
+    async def _renew_claims(self):
+        """
+        Keep the guilds with live games, hand the rest back
+        """
+        idle = [guild_id for guild_id in self._claimed if not self.games.lobbies(guild_id)]
+        if idle:
+            self._claimed.difference_update(idle)
+            await self.scores.flush()
+            await self.state.release(idle)
+        await self.state.renew(self._claimed)
+
+    @Cog.listener()
+    async def on_raw_message_delete(self, payload: discord.RawMessageDeleteEvent):
+        self.reactions.deleted(payload.message_id)
+
+    async def _collect_parked(self):
+        """
+        Periodically delete resources that stayed parked past the TTL
+        """
+        await self.bot.wait_until_ready()
+        while True:
+            busy = [key for key, game in self.games.items() if game.phase.running]
+            await self.resources.collect(self.bot, busy)
+            await asyncio.sleep(COLLECT_INTERVAL)
+
+    async def _sweep_games(self):
+        """
+        Periodically evict lobbies nobody used for a while
+        """
+        while True:
+            await asyncio.sleep(SWEEP_INTERVAL)
+            try:
+                await self.games.evict_idle()
+            except Exception:
+                log.exception("Failed to evict idle lobbies")
+            try:
+                await self._renew_claims()
+            except Exception:
+                # Retried next sweep, well within the lease TTL
+                log.exception("Failed to renew guild leases")
+
+    async def _ingest_replays(self):
+        """
+        Watch the configured replay directory, if any
+        """
+        directory = await self.config.ingest_dir()
+        if directory is not None:
+            await MatchWatcher(directory, self._on_replay).run()
+
+    async def _on_replay(self, path: str):
+        """
+        End the match of the game most of the replay's players are in
+        """
+        header = await asyncio.get_event_loop().run_in_executor(None, read_replay_header, path)
+        saved_at = os.path.getmtime(path)
+
+        best, best_count = None, 0
+        for game in self.games.values():
+            if game.match_started is None or game.match_started > saved_at:
+                continue
+            names = [name for player in game.players for name in (player.member.name, player.member.display_name)]
+            count = match_players(header, names)
+            if count > best_count:
+                best, best_count = game, count
+
+        # Half the replay's players must be in the game, a shared name or two isn't enough
+        if best is not None and best_count * 2 >= len(header["players"]):
+            best.end_match()
+
+    async def _write_metrics(self):
         """
-        Get game from current guild
+        Periodically write stage metrics for Prometheus' textfile collector
+        """
+        path = cog_data_path(self) / "metrics.prom"
+        while True:
+            await asyncio.sleep(METRICS_INTERVAL)
+            stats = self.games.stats()
+            mail = self.mailboxes.recent()
+            self.stats.write_prometheus(path, {
+                "mafia_games": ("Live games", stats["games"]),
+                "mafia_games_running": ("Games with a round in progress", stats["running"]),
+                "mafia_players": ("Players in live games", stats["players"]),
+                "mafia_mailbox_depth": ("Commands waiting in game mailboxes", mail["depth"]),
+                "mafia_mailbox_wait_p95_seconds": ("Recent 95th percentile wait before a command ran", mail["p95"])
+            }, {
+                "mafia_mailbox_commands_total": ("Commands run through game mailboxes", mail["letters"]),
+                "mafia_mailbox_coalesced_total": ("Duplicate commands merged into a waiting one", mail["coalesced"])
+            })
+
+    def _hand_off_games(self):
+        """
+        Stop live games where they are and leave them for the next instance
+        of the cog, so a reload doesn't end them
+
+        The next instance waits for this one to close before it claims
+        guilds, so releasing leases and saving snapshots here can't undo
+        what it does
+        """
+        games = self.games.drain()
+        handoff = []
+        for game in games:
+            channel = game.detach()
+            handoff.append((game.guild.id, game.lobby_id, channel.id if channel is not None else None,
+                            dump_game(game)))
+        closing = asyncio.create_task(self._close_games(games))
+        setattr(self.bot, HANDOFF, (time.monotonic(), handoff, closing))
+
+    async def _take_games(self, handed_at: float, handoff: list):
+        """
+        Resume the games a previous instance handed off, rounds that were
+        running continue in their phase
+        """
+        if not handoff or time.monotonic() - handed_at > HANDOFF_TTL:
+            return  # Too old to resume, their snapshots restore them on next use
+
+        from .game import Game
+
+        for guild_id, lobby, channel_id, data in handoff:
+            guild = self.bot.get_guild(guild_id)
+            if guild is None or not await self._claim(guild):
+                continue
+
+            game = Game(guild, self, lobby)
+            if not load_game(game, data):
+                continue
+            await self.games.add(game)
+
+            channel = guild.get_channel(channel_id) if channel_id is not None else None
+            if channel is not None and game.phase.running:
+                game.resume(channel)
+
+    async def _close_games(self, handed_off=()):
+        # Handed off games are saved in case no new instance picks them up,
+        # which posts their dashboard and prompts again
+        for game in handed_off:
+            await game.close_messages()
+            await self.snapshots.save(game)
+        await self.games.close()
+        self.editor.close()
+        self._scores_task.cancel()
+        self._state_task.cancel()
+        await self.scores.flush()
+        await self.state.close()
+        await self.history.close()
+
+    async def _get_game(self, ctx: commands.Context, lobby: int = None, missing: str = None,
+                        reopen: bool = False):
+        """
+        Game of the given lobby, else of the channel, else the guild's only one
+
+        Sends `missing` if there is no game, or which lobbies there are if
+        the command could mean more than one. A game that ended counts as
+        none, unless `reopen` replaces it with a new one in its lobby
         """
         guild: discord.Guild = ctx.guild
 
         if guild is None:
             await ctx.send("Cannot do this command from PM!")
             return None
-        if guild.id not in self.games:
+
+        if not self.games.lobbies(guild.id) and not await self._claim(guild):
+            await ctx.send(CLAIMED)
             return None
 
-        return self.games[guild.id]
+        if not self.games.lobbies(guild.id):
+            for restored in await self._restore_games(guild):
+                if restored.phase.running:
+                    await ctx.send("Lobby {} was restored after a restart, continue the round with "
+                                   "`[p]mafia start {}`".format(restored.lobby_id, restored.lobby_id))
+
+        if lobby is not None:
+            game = self.games.get(guild.id, lobby)
+        else:
+            game = self.games.by_channel(ctx.channel.id)
+            if game is None:
+                lobbies = [game for game in self.games.lobbies(guild.id).values() if not game.game_over]
+                if len(lobbies) > 1:
+                    await ctx.send("There are {} games, run this in a game's channel or add its lobby number: "
+                                   "{}".format(len(lobbies), ", ".join(str(game.lobby_id) for game in lobbies)))
+                    return None
+                game = lobbies[0] if lobbies else self.games.get(guild.id)
+
+        if game is not None and game.game_over:
+            # The session ended, only commands that start a new one get a game
+            game = await self._reopen(game) if reopen else None
+
+        if game is None and missing is not None:
+            await ctx.send(missing)
+        return game
+
+    async def _reopen(self, closed):
+        """
+        Fresh game in the lobby of a game that ended
+        """
+        from .game import Game
+
+        game = Game(closed.guild, self, closed.lobby_id)
+        await self.games.add(game)
+        return game
+
+    @staticmethod
+    async def _show_dashboard(ctx: commands.Context, game):
+        """
+        Show the game's dashboard, refreshing it in its channel and sending
+        a copy anywhere else
+        """
+        if game.dashboard.message is None or game.dashboard.shown_in(ctx.channel):
+            await game.dashboard.show(ctx.channel)
+        else:
+            await ctx.send(embed=game.dashboard.render())
 
     async def _new_game(self, ctx: commands.Context):
         """
-        New game for current guild
+        New game for current guild, a lobby still gathering players is
+        reused and otherwise the next free lobby is opened
         """
         guild: discord.Guild = ctx.guild
 
         if guild is None:
             await ctx.send("Cannot create new game from PM!")
             return None
-        if guild.id not in self.games or self.games[guild.id].game_over:
-            await ctx.send("Creating a new game...")
-            self.games[guild.id] = Game(guild)
 
-        return self.games[guild.id]
+        if not await self._claim(guild):
+            await ctx.send(CLAIMED)
+            return None
+
+        if not self.games.lobbies(guild.id):
+            await self._restore_games(guild)
+
+        game = self.games.by_channel(ctx.channel.id)
+        if game is not None and not game.game_over:
+            return game
+
+        lobbies = {lobby: game for lobby, game in self.games.lobbies(guild.id).items() if not game.game_over}
+        for lobby, game in sorted(lobbies.items()):
+            if not game.phase.running:
+                return game
+
+        if len(lobbies) >= MAX_LOBBIES:
+            await ctx.send("All {} lobbies are in use! Try again after a game ends".format(MAX_LOBBIES))
+            return None
+
+        from .game import Game
 
-    
\ No newline at end of file
+        game = Game(guild, self, await self.resources.free_lobby(guild, lobbies))
+        await self.games.add(game)
+        return game
@@ -0,0 +1,31 @@
+from enum import Enum
+
+
+class Phase(Enum):
+    """
+    Round lifecycle of a Game
+
+    LOBBY -> JOIN -> SETUP -> DEAL -> PLAY -> VOTE -> REVEAL -> TEARDOWN
+    TEARDOWN goes back to JOIN for another round, or to CLOSED.
+    """
+
+    LOBBY = "lobby"  # Waiting for `[p]mafia start`
+    JOIN = "join"  # Adding queued players
+    SETUP = "setup"  # Discord role, category and channel
+    DEAL = "deal"  # Dealing game roles and sending them out
+    PLAY = "play"  # Rocket League match is being played
+    VOTE = "vote"
+    REVEAL = "reveal"
+    TEARDOWN = "teardown"  # Removing leaving players, asking for another round
+    CLOSED = "closed"
+
+    @property
+    def in_round(self) -> bool:
+        return self in IN_ROUND
+
+    @property
+    def running(self) -> bool:
+        return self not in (Phase.LOBBY, Phase.CLOSED)
+
+
+IN_ROUND = frozenset((Phase.SETUP, Phase.DEAL, Phase.PLAY, Phase.VOTE, Phase.REVEAL))
@@ -1,17 +1,38 @@
 import discord
 
+from typing import Dict, List, Optional, Tuple
+
+# Role cards only depend on the role class, so each is built once
+_role_cards: Dict[type, discord.Embed] = {}
+
+def role_card(role_class: type) -> discord.Embed:
+    """
+    DM embed telling a player their role
+    """
+    card = _role_cards.get(role_class)
+    if card is None:
+        card = _role_cards[role_class] = discord.Embed(title="You are " + role_class.name,
+                                                       description=role_class.game_start_message,
+                                                       color=role_class.color)
+    return card
+
 class Player:
     """
     Base Player class for Mafia game
     """
 
+    __slots__ = ("member", "role", "id", "score")
+
     def __init__(self, member: discord.Member):
         self.member = member
-        self.mention = member.mention
         self.role = None
         self.id = None
         self.score = 0
 
+    @property
+    def mention(self):
+        return self.member.mention
+
     async def assign_role(self, role):
         """
         Give this player a role
@@ -27,10 +48,133 @@ class Player:
             await self.member.send(embed=embed)
         except discord.Forbidden:
             await self.role.game.village_channel.send("Couldn't DM to {}".format(self.mention))
-    
-    async def _start_round(self):
-        embed = discord.Embed(title="You are " + self.role.name,
-                            description=self.role.game_start_message,
-                            color=self.role.color)
 
-        await self.send_dm(embed)
\ No newline at end of file
+    def role_card(self) -> discord.Embed:
+        return role_card(type(self.role))
+
+
+class PlayerRegistry:
+    """
+    Players of a game keyed by member ID
+
+    Lookup, insert and removal are O(1). Iterating or indexing gives a
+    stable view ordered by display name, which is only re-sorted after
+    the membership changed.
+    """
+
+    __slots__ = ("_players", "_ordered")
+
+    def __init__(self):
+        self._players: Dict[int, Player] = {}
+        self._ordered: Optional[List[Player]] = None
+
+    def __len__(self):
+        return len(self._players)
+
+    def __iter__(self):
+        return iter(self.ordered())
+
+    def __getitem__(self, index):
+        return self.ordered()[index]
+
+    def __contains__(self, member: discord.Member):
+        return member.id in self._players
+
+    def get(self, member: discord.Member) -> Optional[Player]:
+        return self._players.get(member.id)
+
+    def add(self, member: discord.Member) -> Player:
+        """
+        Add a member, returns the existing Player if already registered
+        """
+        player = self._players.get(member.id)
+        if player is None:
+            player = self._players[member.id] = Player(member)
+            self._ordered = None
+        return player
+
+    def remove(self, member: discord.Member) -> Optional[Player]:
+        player = self._players.pop(member.id, None)
+        if player is not None:
+            self._ordered = None
+        return player
+
+    def clear(self):
+        self._players.clear()
+        self._ordered = None
+
+    def ordered(self) -> List[Player]:
+        """
+        Players sorted by display name, cached until the next add/remove
+        """
+        if self._ordered is None:
+            self._ordered = sorted(self._players.values(),
+                                   key=lambda player: player.member.display_name.lower())
+        return self._ordered
+
+
+class RosterQueue:
+    """
+    Joins and leaves waiting for the end of a round, as ordered sets
+
+    Queueing a member twice does nothing and a join and a leave of the
+    same member cancel out, so each member has at most one pending change
+    and applying the queue costs the same however much the lobby churns.
+    """
+
+    __slots__ = ("_joins", "_leaves")
+
+    def __init__(self):
+        self._joins: Dict[int, discord.Member] = {}
+        self._leaves: Dict[int, discord.Member] = {}
+
+    def __len__(self):
+        return len(self._joins) + len(self._leaves)
+
+    @property
+    def joining(self) -> List[discord.Member]:
+        return list(self._joins.values())
+
+    @property
+    def leaving(self) -> List[discord.Member]:
+        return list(self._leaves.values())
+
+    def is_joining(self, member: discord.Member) -> bool:
+        return member.id in self._joins
+
+    def is_leaving(self, member: discord.Member) -> bool:
+        return member.id in self._leaves
+
+    def join(self, member: discord.Member, playing: bool) -> bool:
+        """
+        Queue a join, or cancel the member's pending leave. False if nothing changed
+        """
+        if self._leaves.pop(member.id, None) is not None:
+            return True
+        if playing or member.id in self._joins:
+            return False
+        self._joins[member.id] = member
+        return True
+
+    def leave(self, member: discord.Member, playing: bool) -> bool:
+        """
+        Queue a leave, or cancel the member's pending join. False if nothing changed
+        """
+        if self._joins.pop(member.id, None) is not None:
+            return True
+        if not playing or member.id in self._leaves:
+            return False
+        self._leaves[member.id] = member
+        return True
+
+    def take(self) -> Tuple[List[discord.Member], List[discord.Member]]:
+        """
+        Pending joins and leaves in the order they were queued, emptying the queue
+        """
+        joins, leaves = self.joining, self.leaving
+        self.clear()
+        return joins, leaves
+
+    def clear(self):
+        self._joins.clear()
+        self._leaves.clear()
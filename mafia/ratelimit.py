@@ -0,0 +1,81 @@
+import asyncio
+import time
+
+import discord
+
+from .stats import note_rate_limit
+
+
+class RouteBucket:
+    """
+    Local model of a Discord rate limit bucket
+
+    Discord hands out `limit` requests per `per` seconds on a route.
+    Tracking the window locally lets us wait before sending instead of
+    waiting after a 429.
+    """
+
+    def __init__(self, limit: int, per: float):
+        self.limit = limit
+        self.per = per
+        self.remaining = limit
+        self.reset_at = 0.0
+
+    def _refill(self, now: float):
+        if now >= self.reset_at:
+            self.remaining = self.limit
+            self.reset_at = now + self.per
+
+    def delay(self) -> float:
+        """
+        Seconds until a request can be sent on this bucket
+        """
+        now = time.monotonic()
+        self._refill(now)
+        if self.remaining > 0:
+            return 0.0
+        return self.reset_at - now
+
+    def load(self) -> float:
+        """
+        Fraction of the current window already spent (0.0 - 1.0)
+        """
+        self._refill(time.monotonic())
+        return 1 - self.remaining / self.limit
+
+    async def acquire(self) -> float:
+        """
+        Wait for a free request slot and take it, returns time waited
+        """
+        waited = 0.0
+        while True:
+            delay = self.delay()
+            if delay <= 0:
+                self.remaining -= 1
+                if waited:
+                    note_rate_limit(waited)
+                return waited
+            await asyncio.sleep(delay)
+            waited += delay
+
+    def backoff(self, retry_after: float):
+        """
+        Drain the bucket after Discord answered with a 429
+        """
+        self.remaining = 0
+        self.reset_at = max(self.reset_at, time.monotonic() + retry_after)
+
+
+async def retry_on_429(call, attempts: int = 3, base: float = 1.0):
+    """
+    Await call(), retrying with exponential backoff while Discord answers 429
+    """
+    for attempt in range(attempts):
+        try:
+            return await call()
+        except discord.HTTPException as error:
+            if error.status != 429 or attempt == attempts - 1:
+                raise
+            delay = max(getattr(error, "retry_after", None) or 0, base * 2 ** attempt)
+            note_rate_limit(delay)
+            await asyncio.sleep(delay)
@@ -0,0 +1,205 @@
+import logging
+import sys
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import discord
+
+from .resources import DEFAULT_LOBBY
+
+if TYPE_CHECKING:
+    from .game import Game
+
+log = logging.getLogger("red.mafia.registry")
+
+Key = Tuple[int, int]
+
+
+class GameRegistry:
+    """
+    Live games keyed by (guild ID, lobby ID)
+
+    Games are kept in least recently active order. Lobbies idle for
+    longer than `lobby_ttl` are evicted by `evict_idle`, and adding past
+    `max_games` evicts the least recently active game, lobbies first.
+    A guild's lobbies and the game of a lobby channel are found in O(1).
+    """
+
+    def __init__(self, max_games: int = 1000, lobby_ttl: float = 3600):
+        self.max_games = max_games
+        self.lobby_ttl = lobby_ttl
+
+        self._games: "OrderedDict[Key, Game]" = OrderedDict()
+        self._last_active: Dict[Key, float] = {}
+        self._guilds: Dict[int, Dict[int, "Game"]] = {}
+        self._channels: Dict[int, Key] = {}
+
+    def __contains__(self, key: Key):
+        return key in self._games
+
+    def __getitem__(self, key: Key) -> "Game":
+        return self._games[key]
+
+    def __len__(self):
+        return len(self._games)
+
+    def items(self):
+        return self._games.items()
+
+    def values(self):
+        return self._games.values()
+
+    def get(self, guild_id: int, lobby_id: int = DEFAULT_LOBBY) -> Optional["Game"]:
+        game = self._games.get((guild_id, lobby_id))
+        if game is not None:
+            self.touch(guild_id, lobby_id)
+        return game
+
+    def lobbies(self, guild_id: int) -> Dict[int, "Game"]:
+        """
+        Games of a guild by lobby ID
+        """
+        return self._guilds.get(guild_id, {})
+
+    def by_channel(self, channel_id: int) -> Optional["Game"]:
+        """
+        Game playing in a channel, None outside lobby channels
+        """
+        key = self._channels.get(channel_id)
+        game = self._games.get(key) if key is not None else None
+        if game is None or game.village_channel is None or game.village_channel.id != channel_id:
+            self._channels.pop(channel_id, None)
+            return None
+
+        self.touch(*key)
+        return game
+
+    def bind_channel(self, game: "Game"):
+        """
+        Route commands and events from the game's channel to it
+        """
+        if game.village_channel is not None:
+            self._channels[game.village_channel.id] = game.key
+
+    def touch(self, guild_id: int, lobby_id: int = DEFAULT_LOBBY):
+        """
+        Mark a lobby's game as active now
+        """
+        key = (guild_id, lobby_id)
+        if key in self._games:
+            self._games.move_to_end(key)
+            self._last_active[key] = time.monotonic()
+
+    async def add(self, game: "Game"):
+        """
+        Register a game, replacing and closing any previous one of its lobby
+        """
+        previous = self._pop(game.key)
+        if previous is not None and previous is not game:
+            await self._close(previous)
+
+        self._games[game.key] = game
+        self._last_active[game.key] = time.monotonic()
+        self._guilds.setdefault(game.guild.id, {})[game.lobby_id] = game
+        self.bind_channel(game)
+
+        while len(self._games) > self.max_games:
+            await self.evict(self._lru_victim())
+
+    async def evict(self, key: Key):
+        game = self._pop(key)
+        if game is not None:
+            await self._close(game)
+
+    async def evict_idle(self) -> List[Key]:
+        """
+        Evict lobbies and finished games that have been idle past the TTL
+        """
+        cutoff = time.monotonic() - self.lobby_ttl
+        idle = []
+        for key, game in self._games.items():
+            if self._last_active[key] > cutoff:
+                break  # Ordered by activity, everything after is newer
+            if not game.phase.running:
+                idle.append(key)
+
+        for key in idle:
+            await self.evict(key)
+        return idle
+
+    def drain(self) -> List["Game"]:
+        """
+        Remove every game without closing it, to hand them to another registry
+        """
+        games = list(self._games.values())
+        self._games.clear()
+        self._last_active.clear()
+        self._guilds.clear()
+        self._channels.clear()
+        return games
+
+    async def close(self):
+        """
+        Close every game, cancelling pending waits and releasing resources
+        """
+        while self._games:
+            key = next(iter(self._games))
+            await self._close(self._pop(key))
+
+    def stats(self) -> dict:
+        running = sum(1 for game in self._games.values() if game.phase.running)
+        return {
+            "games": len(self._games),
+            "running": running,
+            "lobbies": len(self._games) - running,
+            "players": sum(len(game.players) for game in self._games.values()),
+            "approx_bytes": sum(self._approx_size(game) for game in self._games.values())
+        }
+
+    def _pop(self, key: Key) -> Optional["Game"]:
+        game = self._games.pop(key, None)
+        self._last_active.pop(key, None)
+        if game is None:
+            return None
+
+        lobbies = self._guilds.get(key[0], {})
+        lobbies.pop(key[1], None)
+        if not lobbies:
+            self._guilds.pop(key[0], None)
+        if game.village_channel is not None and self._channels.get(game.village_channel.id) == key:
+            del self._channels[game.village_channel.id]
+        return game
+
+    def _lru_victim(self) -> Key:
+        for key, game in self._games.items():
+            if not game.phase.running:
+                return key
+        return next(iter(self._games))
+
+    @staticmethod
+    async def _close(game: "Game"):
+        try:
+            await game.end()
+        except (discord.Forbidden, discord.HTTPException):
+            pass
+        except Exception:
+            # One broken game must not keep the others from closing
+            log.exception("Failed to close the game of lobby %s", game.key)
+
+    @staticmethod
+    def _approx_size(game: "Game") -> int:
+        """
+        Shallow estimate of what the game itself keeps alive, Discord
+        objects are shared with the bot's cache and are not counted
+        """
+        size = sys.getsizeof(game) + sys.getsizeof(game.__dict__)
+        size += sys.getsizeof(game.players._players)
+        size += sum(sys.getsizeof(player) for player in game.players)
+        size += sys.getsizeof(game.roles) + sum(sys.getsizeof(role) for role in game.roles)
+        size += sys.getsizeof(game.queue._joins) + sys.getsizeof(game.queue._leaves)
+        size += sys.getsizeof(game.vote_totals)
+        if game.tally is not None:
+            size += sum(sys.getsizeof(table) for table in (game.tally.options, game.tally.votes,
+                                                          game.tally.counts, game.tally.voters))
+        return size
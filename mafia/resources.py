@@ -0,0 +1,249 @@
+import time
+from typing import Dict, Iterable, Optional, Tuple
+
+import discord
+from redbot.core import Config
+
+ROLE_NAME = "Mafia Players"
+CATEGORY_NAME = "Rocket League Mafia"
+CHANNEL_NAME = "village"
+# Lobby whose resources keep the plain names and the original Config keys
+DEFAULT_LOBBY = 1
+# Resource IDs every lobby slot has, Config only returns the ones written
+SLOT_KEYS = ("role_id", "channel_id", "parked_at")
+
+
+def role_name(lobby: int) -> str:
+    return ROLE_NAME if lobby == DEFAULT_LOBBY else "{} {}".format(ROLE_NAME, lobby)
+
+
+def channel_name(lobby: int) -> str:
+    return CHANNEL_NAME if lobby == DEFAULT_LOBBY else "{}-{}".format(CHANNEL_NAME, lobby)
+
+
+class ResourceResolver:
+    """
+    Finds or creates the Discord role, category and channels of a guild
+
+    Every lobby of a guild has a slot with its own role and channel, all
+    under one shared category. Resource IDs are kept in the state backend
+    and resolved from the guild cache in O(1). An ID is only validated when
+    the resource is asked for, and a stale one falls back to a name scan,
+    then to creating the resource. Overwrites are only written when they
+    differ from what is applied.
+
+    Between games a slot is parked: the channel is hidden from the game
+    role with one overwrite change, and starting the next game is the
+    reverse toggle. Parked slots are the pool new lobbies are taken from,
+    slots parked longer than the TTL are deleted.
+    """
+
+    def __init__(self, config: Config, state):
+        self.config = config
+        self.state = state
+        self._ids: Dict[int, dict] = {}
+
+    async def role(self, guild: discord.Guild, lobby: int = DEFAULT_LOBBY) -> discord.Role:
+        slot = self._slot(await self._guild_ids(guild), lobby)
+        role = guild.get_role(slot["role_id"]) if slot["role_id"] else None
+
+        if role is None:
+            name = role_name(lobby)
+            for guild_role in guild.roles:
+                if guild_role.name == name:
+                    role = guild_role
+                    break
+            else:
+                role = await guild.create_role(name=name, mentionable=True,
+                                               reason="(BOT)Mafia Game Role")
+            await self._store(guild, "role_id", role.id, lobby)
+
+        if not role.mentionable:
+            await role.edit(mentionable=True, reason="(BOT)Mafia Game Role")
+        return role
+
+    async def category(self, guild: discord.Guild) -> discord.CategoryChannel:
+        """
+        Category shared by every lobby, game roles get access per channel
+        """
+        ids = await self._guild_ids(guild)
+        overwrites = self.overwrites(guild, None)
+        category = guild.get_channel(ids["category_id"]) if ids["category_id"] else None
+
+        if category is None:
+            for guild_category in guild.categories:
+                if guild_category.name == CATEGORY_NAME:
+                    category = guild_category
+                    break
+            else:
+                category = await guild.create_category(CATEGORY_NAME, overwrites=overwrites,
+                                                       reason="(BOT)New Mafia game")
+            await self._store(guild, "category_id", category.id)
+
+        await self.sync_overwrites(category, overwrites)
+        return category
+
+    async def channel(self, guild: discord.Guild, category: discord.CategoryChannel,
+                      role: discord.Role, lobby: int = DEFAULT_LOBBY) -> discord.TextChannel:
+        slot = self._slot(await self._guild_ids(guild), lobby)
+        overwrites = self.overwrites(guild, role)
+        channel = guild.get_channel(slot["channel_id"]) if slot["channel_id"] else None
+
+        if channel is None:
+            name = channel_name(lobby)
+            for text_channel in guild.text_channels:
+                if text_channel.name == name:
+                    channel = text_channel
+                    break
+            else:
+                channel = await guild.create_text_channel(name, overwrites=overwrites, category=category,
+                                                          reason="(BOT) New Mafia Game")
+            await self._store(guild, "channel_id", channel.id, lobby)
+
+        await self.sync_overwrites(channel, overwrites)
+        if slot["parked_at"] is not None:
+            await self._store(guild, "parked_at", None, lobby)
+        return channel
+
+    async def park(self, guild: discord.Guild, channel: discord.TextChannel, role: discord.Role,
+                   lobby: int = DEFAULT_LOBBY):
+        """
+        Hide the channel until the next game instead of deleting it
+        """
+        await self._guild_ids(guild)
+        await self.sync_overwrites(channel, self.overwrites(guild, role, parked=True))
+        await self._store(guild, "parked_at", time.time(), lobby)
+
+    async def provision(self, guild: discord.Guild, lobby: int):
+        """
+        Create a lobby's slot ahead of demand and park it
+        """
+        role = await self.role(guild, lobby)
+        category = await self.category(guild)
+        channel = await self.channel(guild, category, role, lobby)
+        await self.park(guild, channel, role, lobby)
+
+    async def delete(self, guild: discord.Guild, lobby: int = DEFAULT_LOBBY):
+        """
+        Delete a lobby's resources and forget their IDs, the category goes
+        with the last lobby
+        """
+        ids = await self._guild_ids(guild)
+        slot = self._slot(ids, lobby)
+
+        for key, get in (("channel_id", guild.get_channel), ("role_id", guild.get_role)):
+            resource = get(slot[key]) if slot[key] else None
+            if resource is not None:
+                await resource.delete(reason="(BOT) Mafia Game Has Ended")
+            await self._store(guild, key, None, lobby)
+        await self._store(guild, "parked_at", None, lobby)
+
+        if not any(other["channel_id"] for _, other in self._slots(ids)):
+            category = guild.get_channel(ids["category_id"]) if ids["category_id"] else None
+            if category is not None:
+                await category.delete(reason="(BOT) Mafia Game Has Ended")
+            await self._store(guild, "category_id", None)
+
+    async def slots(self, guild: discord.Guild) -> Dict[int, Optional[float]]:
+        """
+        Lobbies of the guild that have resources, with when they were parked
+        """
+        ids = await self._guild_ids(guild)
+        return {lobby: slot["parked_at"] for lobby, slot in self._slots(ids)
+                if slot["role_id"] or slot["channel_id"]}
+
+    async def free_lobby(self, guild: discord.Guild, busy: Iterable[int] = ()) -> int:
+        """
+        Lobby ID for a new game, a parked slot if there is one
+        """
+        busy = set(busy)
+        slots = await self.slots(guild)
+
+        parked = [lobby for lobby, parked_at in slots.items() if parked_at is not None and lobby not in busy]
+        if parked:
+            return min(parked)
+
+        lobby = DEFAULT_LOBBY
+        while lobby in busy or lobby in slots:
+            lobby += 1
+        return lobby
+
+    async def collect(self, bot, busy: Iterable[Tuple[int, int]] = ()):
+        """
+        Delete lobby slots that have been parked longer than the TTL
+        """
+        ttl = await self.config.resource_ttl()
+        now = time.time()
+        busy = set(busy)
+
+        for guild_id, data in (await self.state.all_resources()).items():
+            for lobby, slot in self._slots(data):
+                parked_at = slot.get("parked_at")
+                if parked_at is None or now - parked_at < ttl or (guild_id, lobby) in busy:
+                    continue
+
+                guild = bot.get_guild(guild_id)
+                if guild is not None:
+                    try:
+                        await self.delete(guild, lobby)
+                    except (discord.Forbidden, discord.HTTPException):
+                        pass
+
+    def forget(self, guild_id: int):
+        """
+        Drop the cached IDs of a guild, another process may have changed them
+        """
+        self._ids.pop(guild_id, None)
+
+    @staticmethod
+    def overwrites(guild: discord.Guild, role: Optional[discord.Role], parked: bool = False) -> dict:
+        overwrites = {
+            guild.default_role: discord.PermissionOverwrite(read_messages=False, send_messages=False,
+                                                            add_reactions=False),
+            guild.me: discord.PermissionOverwrite(read_messages=True, send_messages=True, add_reactions=True,
+                                                  manage_messages=True, manage_channels=True,
+                                                  manage_roles=True, read_message_history=True)
+        }
+        if role is not None:
+            overwrites[role] = discord.PermissionOverwrite(read_messages=not parked, send_messages=not parked)
+        return overwrites
+
+    @staticmethod
+    async def sync_overwrites(channel, overwrites: dict):
+        """
+        Edit the channel only if its overwrites differ from the wanted ones
+        """
+        if channel.overwrites != overwrites:
+            await channel.edit(overwrites=overwrites, reason="(BOT) Mafia Game Permissions")
+
+    async def _guild_ids(self, guild: discord.Guild) -> dict:
+        ids = self._ids.get(guild.id)
+        if ids is None:
+            ids = self._ids[guild.id] = await self.state.resources(guild.id)
+        return ids
+
+    @staticmethod
+    def _slot(ids: dict, lobby: int) -> dict:
+        """
+        Resource IDs of a lobby, the default lobby uses the guild's own keys
+
+        Keys missing from a slot are filled in with None, Config stores a
+        lobby's keys one by one and returns only those that were written.
+        """
+        if lobby == DEFAULT_LOBBY:
+            return ids
+        slot = ids.setdefault("lobbies", {}).setdefault(str(lobby), {})
+        for key in SLOT_KEYS:
+            slot.setdefault(key, None)
+        return slot
+
+    @staticmethod
+    def _slots(ids: dict):
+        yield DEFAULT_LOBBY, ids
+        for lobby in list(ids.get("lobbies", {})):
+            yield int(lobby), ResourceResolver._slot(ids, int(lobby))
+
+    async def _store(self, guild: discord.Guild, key: str, value, lobby: int = DEFAULT_LOBBY):
+        ids = self._ids[guild.id]
+        self._slot(ids, lobby)[key] = value
+        await self.state.set_resource(guild.id, key, value, lobby)
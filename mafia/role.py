@@ -1,5 +1,5 @@
 class Role:
-    alignment = 0  # 1: Town, 2: Mafia
+    alignment = 0  # 1: Town, 2: Mafia, 3: Neutral
     name = "Default"
     color = 9807270 # Grey
     game_start_message = (
@@ -44,5 +44,19 @@ class Godfather(Role):
         "Don't let town know you are trying to throw the game"
     )
 
+    def __init__(self):
+        super().__init__()
+
+# Neutral Roles
+class Jester(Role):
+    alignment = 3  # 1: Town, 2: Mafia, 3: Neutral
+    color = 10181046 # Purple
+    name = "Jester"
+    game_start_message = (
+        "Your role is **Jester**\n"
+        "You win by getting the most votes\n"
+        "Act suspicious enough that town thinks you are the mafia"
+    )
+
     def __init__(self):
         super().__init__()
\ No newline at end of file
@@ -0,0 +1,120 @@
+import asyncio
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+import discord
+
+
+class Leaderboard:
+    """
+    Scores of one guild kept sorted as (-score, member id)
+
+    Updates keep the order incrementally, so ranks are a binary search
+    and the top N a slice, nothing is re-sorted or reloaded.
+    """
+
+    __slots__ = ("_scores", "_order")
+
+    def __init__(self, scores: Dict[int, int] = None):
+        self._scores: Dict[int, int] = dict(scores or {})
+        self._order: List[Tuple[int, int]] = sorted((-score, member_id)
+                                                     for member_id, score in self._scores.items())
+
+    def __len__(self):
+        return len(self._scores)
+
+    def score(self, member_id: int) -> Optional[int]:
+        return self._scores.get(member_id)
+
+    def add(self, member_id: int, points: int) -> int:
+        """
+        Add points to a member, returns their new total
+        """
+        old = self._scores.get(member_id)
+        if old is not None:
+            del self._order[bisect_left(self._order, (-old, member_id))]
+            new = old + points
+        else:
+            new = points
+
+        self._scores[member_id] = new
+        insort(self._order, (-new, member_id))
+        return new
+
+    def rank(self, member_id: int) -> Optional[int]:
+        """
+        1-based position of the member, None if they never scored
+        """
+        score = self._scores.get(member_id)
+        if score is None:
+            return None
+        return bisect_left(self._order, (-score, member_id)) + 1
+
+    def top(self, count: int) -> List[Tuple[int, int]]:
+        return [(member_id, -score) for score, member_id in self._order[:count]]
+
+
+class ScoreLedger:
+    """
+    Write-behind ledger of player scores
+
+    Round results are applied to the in-memory leaderboards right away
+    and added to the state backend every `flush_interval` seconds, one
+    write per guild no matter how many players scored. Points are written
+    as increments, so processes sharing a backend don't overwrite each
+    other's totals.
+    """
+
+    def __init__(self, state, flush_interval: float = 30):
+        self.state = state
+        self.flush_interval = flush_interval
+
+        self._boards: Dict[int, Leaderboard] = {}
+        self._dirty: Dict[int, Tuple[discord.Guild, Dict[int, int]]] = {}
+
+    async def board(self, guild: discord.Guild) -> Leaderboard:
+        """
+        Leaderboard of the guild, loaded from the state backend on first use
+        """
+        board = self._boards.get(guild.id)
+        if board is None:
+            board = self._boards[guild.id] = Leaderboard(await self.state.scores(guild.id))
+        return board
+
+    async def record(self, guild: discord.Guild, points: Dict[int, int]):
+        """
+        Add a round's points per member ID
+        """
+        board = await self.board(guild)
+        pending = self._dirty.setdefault(guild.id, (guild, {}))[1]
+
+        for member_id, earned in points.items():
+            board.add(member_id, earned)
+            pending[member_id] = pending.get(member_id, 0) + earned
+
+    async def flush(self):
+        """
+        Write every guild's unsaved points, one backend write per guild
+        """
+        dirty, self._dirty = self._dirty, {}
+
+        for guild, pending in dirty.values():
+            await self.state.add_scores(guild.id, pending)
+
+    def forget(self, guild_id: int):
+        """
+        Drop the cached leaderboard of a guild, reloaded on next use
+        """
+        if guild_id not in self._dirty:
+            self._boards.pop(guild_id, None)
+
+    async def run(self):
+        """
+        Flush loop, runs until cancelled
+        """
+        try:
+            while True:
+                await asyncio.sleep(self.flush_interval)
+                await self.flush()
+        finally:
+            await self.flush()
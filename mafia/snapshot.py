@@ -0,0 +1,153 @@
+from typing import TYPE_CHECKING, List
+
+import discord
+
+from .phase import Phase
+from .resources import DEFAULT_LOBBY
+from .role import Role
+from .tally import VoteTally
+
+if TYPE_CHECKING:
+    from .game import Game
+
+SNAPSHOT_VERSION = 1
+
+
+def role_classes() -> dict:
+    """
+    Every Role subclass by class name
+    """
+    classes = {}
+    pending = [Role]
+    while pending:
+        role_class = pending.pop()
+        classes[role_class.__name__] = role_class
+        pending.extend(role_class.__subclasses__())
+    return classes
+
+
+def dump_game(game: "Game") -> dict:
+    """
+    Compact, JSON safe state of a game
+    """
+    return {
+        "v": SNAPSHOT_VERSION,
+        "phase": game.phase.value,
+        "game_type": game.game_type,
+        "deal_seed": game.deal_seed,
+        "team_count": game.team_count,
+        # [member id, role class, player id, session score]
+        "players": [[player.member.id, type(player.role).__name__ if player.role is not None else None,
+                     player.id, player.score] for player in game.players],
+        "join_queue": [member.id for member in game.queue.joining],
+        "leave_queue": [member.id for member in game.queue.leaving],
+        "vote_totals": [[member_id, votes] for member_id, votes in game.vote_totals.items()],
+        "votes": [[voter, candidate] for voter, candidate in game.tally.votes.items()] if game.tally else [],
+        "role_id": game.game_role.id if game.game_role is not None else None,
+        "category_id": game.channel_category.id if game.channel_category is not None else None,
+        "channel_id": game.village_channel.id if game.village_channel is not None else None
+    }
+
+
+def load_game(game: "Game", data: dict) -> bool:
+    """
+    Restore a snapshot into a fresh game, members that left the guild are dropped
+    """
+    if data.get("v") != SNAPSHOT_VERSION:
+        return False
+
+    guild = game.guild
+    classes = role_classes()
+
+    game.phase = Phase(data["phase"])
+    game.game_type = data["game_type"]
+    game.deal_seed = data.get("deal_seed")
+    game.team_count = data.get("team_count", game.team_count)
+
+    for member_id, role_name, player_id, score in data["players"]:
+        member = guild.get_member(member_id)
+        if member is None:
+            continue
+        player = game.players.add(member)
+        player.id = player_id
+        player.score = score
+        if role_name in classes:
+            role = classes[role_name]()
+            role.player = player
+            player.role = role
+            game.roles.append(role)
+
+    for member in map(guild.get_member, data["join_queue"]):
+        if member is not None:
+            game.queue.join(member, member in game.players)
+    for member in map(guild.get_member, data["leave_queue"]):
+        if member is not None:
+            game.queue.leave(member, member in game.players)
+
+    game.vote_totals = {member_id: votes for member_id, votes in data["vote_totals"]}
+    if data["votes"]:
+        game.tally = VoteTally(player.member.id for player in game.players)
+        game.tally.votes = {voter: candidate for voter, candidate in data["votes"]}
+        game.tally.close()
+
+    game.game_role = guild.get_role(data["role_id"]) if data["role_id"] else None
+    game.channel_category = guild.get_channel(data["category_id"]) if data["category_id"] else None
+    game.village_channel = guild.get_channel(data["channel_id"]) if data["channel_id"] else None
+
+    # A round dealt with players that are gone can't continue, deal again
+    if game.phase.in_round and len(game.roles) != len(game.players):
+        game.roles = []
+        game.phase = Phase.JOIN
+
+    # Past setup the round needs its role and channel, if either was deleted
+    # meanwhile both are set up again and the round is dealt again
+    past_setup = game.phase.running and game.phase not in (Phase.JOIN, Phase.SETUP)
+    if past_setup and (game.game_role is None or game.village_channel is None):
+        game.game_role = None
+        game.village_channel = None
+        game.roles = []
+        game.phase = Phase.JOIN
+    return True
+
+
+class SnapshotStore:
+    """
+    Versioned game snapshots in the state backend, restored lazily
+
+    The backend keeps an index of the lobbies that have a snapshot, so
+    after a restart a guild's games are only rebuilt on its first command
+    or event instead of restoring every guild at startup.
+    """
+
+    def __init__(self, state):
+        self.state = state
+
+    async def save(self, game: "Game"):
+        if game.phase is Phase.CLOSED or (game.phase is Phase.LOBBY and len(game.players) == 0):
+            await self.clear(game.guild, game.lobby_id)
+            return
+
+        await self.state.set_snapshot(game.guild.id, game.lobby_id, dump_game(game))
+
+    async def clear(self, guild: discord.Guild, lobby: int = DEFAULT_LOBBY):
+        await self.state.set_snapshot(guild.id, lobby, None)
+
+    async def has_snapshot(self, guild_id: int) -> bool:
+        return bool(await self.state.snapshot_lobbies(guild_id))
+
+    async def restore(self, guild: discord.Guild, cog) -> List["Game"]:
+        """
+        Rebuild every lobby of the guild that has a snapshot
+        """
+        from .game import Game
+
+        games = []
+        for lobby in sorted(await self.state.snapshot_lobbies(guild.id)):
+            data = await self.state.snapshot(guild.id, lobby)
+
+            game = Game(guild, cog, lobby)
+            if data and load_game(game, data):
+                games.append(game)
+            else:
+                await self.clear(guild, lobby)
+        return games
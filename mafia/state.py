@@ -0,0 +1,312 @@
+import asyncio
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from redbot.core import Config
+
+from .resources import DEFAULT_LOBBY, SLOT_KEYS
+
+log = logging.getLogger("red.mafia.state")
+
+# Seconds a guild stays owned by a process without renewing its lease
+LEASE_TTL = 180
+# Seconds queued SQLite writes wait to be committed together
+FLUSH_INTERVAL = 0.5
+
+
+class ConfigState:
+    """
+    Scores, resource IDs and snapshots kept in Red's Config
+
+    The default for a single bot process. Every guild is owned by this
+    process, so leases are always granted.
+    """
+
+    def __init__(self, config: Config):
+        self.config = config
+        self._snapshots: Optional[Dict[int, Set[int]]] = None
+
+    async def acquire(self, guild_id: int) -> bool:
+        return True
+
+    async def renew(self, guild_ids: Iterable[int]):
+        pass
+
+    async def release(self, guild_ids: Iterable[int]):
+        pass
+
+    async def resources(self, guild_id: int) -> dict:
+        return await self.config.guild_from_id(guild_id).all()
+
+    async def all_resources(self) -> Dict[int, dict]:
+        return await self.config.all_guilds()
+
+    async def set_resource(self, guild_id: int, key: str, value, lobby: int = DEFAULT_LOBBY):
+        if lobby == DEFAULT_LOBBY:
+            await self.config.guild_from_id(guild_id).set_raw(key, value=value)
+        else:
+            await self.config.guild_from_id(guild_id).set_raw("lobbies", str(lobby), key, value=value)
+
+    async def scores(self, guild_id: int) -> Dict[int, int]:
+        scores = await self.config.guild_from_id(guild_id).scores()
+        return {int(member_id): score for member_id, score in scores.items()}
+
+    async def add_scores(self, guild_id: int, points: Dict[int, int]):
+        async with self.config.guild_from_id(guild_id).scores() as scores:
+            for member_id, earned in points.items():
+                scores[str(member_id)] = scores.get(str(member_id), 0) + earned
+
+    async def snapshot(self, guild_id: int, lobby: int) -> Optional[dict]:
+        if lobby == DEFAULT_LOBBY:
+            return await self.config.guild_from_id(guild_id).snapshot()
+        return await self.config.guild_from_id(guild_id).get_raw("lobbies", str(lobby), "snapshot", default=None)
+
+    async def set_snapshot(self, guild_id: int, lobby: int, data: Optional[dict]):
+        if lobby == DEFAULT_LOBBY:
+            await self.config.guild_from_id(guild_id).snapshot.set(data)
+        else:
+            await self.config.guild_from_id(guild_id).set_raw("lobbies", str(lobby), "snapshot", value=data)
+        await self._index(guild_id, lobby, data is not None)
+
+    async def snapshot_lobbies(self, guild_id: int) -> Set[int]:
+        """
+        Lobbies of the guild with a snapshot, from a small global index
+        so guilds without one cost no Config read
+        """
+        return set((await self._load_index()).get(guild_id, ()))
+
+    async def run(self):
+        pass
+
+    async def close(self):
+        pass
+
+    async def _load_index(self) -> Dict[int, Set[int]]:
+        if self._snapshots is None:
+            self._snapshots = {}
+            for entry in await self.config.snapshot_guilds():
+                # Entries from before lobbies are plain guild IDs
+                guild_id, lobby = entry if isinstance(entry, list) else (entry, DEFAULT_LOBBY)
+                self._snapshots.setdefault(guild_id, set()).add(lobby)
+        return self._snapshots
+
+    async def _index(self, guild_id: int, lobby: int, present: bool):
+        index = await self._load_index()
+        lobbies = index.get(guild_id, set())
+        if (lobby in lobbies) == present:
+            return
+
+        if present:
+            index.setdefault(guild_id, set()).add(lobby)
+        else:
+            lobbies.discard(lobby)
+            if not lobbies:
+                del index[guild_id]
+        await self.config.snapshot_guilds.set([[guild_id, lobby] for guild_id, lobbies in index.items()
+                                               for lobby in sorted(lobbies)])
+
+
+class SQLiteState:
+    """
+    Scores, resource IDs and snapshots in a SQLite database in WAL mode
+
+    Several bot processes on one host can share the file. A guild's game
+    is only run by the process holding the guild's lease, which it renews
+    while games are live, so the in-process caches of the owner stay
+    right. Writes are queued and committed together every
+    `flush_interval` seconds, reads commit pending writes first.
+    """
+
+    def __init__(self, path: str, owner: str = None, flush_interval: float = FLUSH_INTERVAL):
+        self.path = path
+        self.owner = owner or "{}:{}".format(socket.gethostname(), os.getpid())
+        self.flush_interval = flush_interval
+
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._writes: List[Tuple[str, tuple]] = []
+        self._owned: Dict[int, float] = {}  # guild id -> lease expiry
+        self._lobbies: Dict[int, Set[int]] = {}  # guild id -> lobbies with a snapshot
+
+        self._db = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("PRAGMA busy_timeout=5000")
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS leases (
+                guild_id INTEGER PRIMARY KEY, owner TEXT NOT NULL, expires REAL NOT NULL);
+            CREATE TABLE IF NOT EXISTS resources (
+                guild_id INTEGER, lobby INTEGER, key TEXT, value,
+                PRIMARY KEY (guild_id, lobby, key));
+            CREATE TABLE IF NOT EXISTS scores (
+                guild_id INTEGER, member_id INTEGER, score INTEGER NOT NULL,
+                PRIMARY KEY (guild_id, member_id));
+            CREATE TABLE IF NOT EXISTS snapshots (
+                guild_id INTEGER, lobby INTEGER, data TEXT NOT NULL,
+                PRIMARY KEY (guild_id, lobby));
+        """)
+
+    async def acquire(self, guild_id: int) -> bool:
+        """
+        Take or keep ownership of the guild, False if another process holds it
+        """
+        now = time.time()
+        if self._owned.get(guild_id, 0) > now + LEASE_TTL / 2:
+            return True
+
+        acquired = await self._call(self._acquire, guild_id, now)
+        if not acquired or guild_id not in self._owned:
+            # Another process may have changed the guild's snapshots meanwhile
+            self._lobbies.pop(guild_id, None)
+        if acquired:
+            self._owned[guild_id] = now + LEASE_TTL
+        else:
+            self._owned.pop(guild_id, None)
+        return acquired
+
+    async def renew(self, guild_ids: Iterable[int]):
+        now = time.time()
+        guild_ids = [guild_id for guild_id in guild_ids if guild_id in self._owned]
+        await self._call(self._executemany, "UPDATE leases SET expires = ? WHERE guild_id = ? AND owner = ?",
+                         [(now + LEASE_TTL, guild_id, self.owner) for guild_id in guild_ids])
+        for guild_id in guild_ids:
+            self._owned[guild_id] = now + LEASE_TTL
+
+    async def release(self, guild_ids: Iterable[int]):
+        guild_ids = [guild_id for guild_id in guild_ids if self._owned.pop(guild_id, None) is not None]
+        for guild_id in guild_ids:
+            self._lobbies.pop(guild_id, None)
+        await self.flush()
+        await self._call(self._executemany, "DELETE FROM leases WHERE guild_id = ? AND owner = ?",
+                         [(guild_id, self.owner) for guild_id in guild_ids])
+
+    async def resources(self, guild_id: int) -> dict:
+        rows = await self._query("SELECT guild_id, lobby, key, value FROM resources WHERE guild_id = ?", guild_id)
+        return self._resources(rows).get(guild_id) or self._empty()
+
+    async def all_resources(self) -> Dict[int, dict]:
+        return self._resources(await self._query("SELECT guild_id, lobby, key, value FROM resources"))
+
+    async def set_resource(self, guild_id: int, key: str, value, lobby: int = DEFAULT_LOBBY):
+        if key == "category_id":
+            lobby = DEFAULT_LOBBY
+        self._write("INSERT INTO resources VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (guild_id, lobby, key) DO UPDATE SET value = excluded.value",
+                    (guild_id, lobby, key, value))
+
+    async def scores(self, guild_id: int) -> Dict[int, int]:
+        rows = await self._query("SELECT member_id, score FROM scores WHERE guild_id = ?", guild_id)
+        return dict(rows)
+
+    async def add_scores(self, guild_id: int, points: Dict[int, int]):
+        for member_id, earned in points.items():
+            self._write("INSERT INTO scores VALUES (?, ?, ?) "
+                        "ON CONFLICT (guild_id, member_id) DO UPDATE SET score = score + excluded.score",
+                        (guild_id, member_id, earned))
+
+    async def snapshot(self, guild_id: int, lobby: int) -> Optional[dict]:
+        rows = await self._query("SELECT data FROM snapshots WHERE guild_id = ? AND lobby = ?", guild_id, lobby)
+        return json.loads(rows[0][0]) if rows else None
+
+    async def set_snapshot(self, guild_id: int, lobby: int, data: Optional[dict]):
+        lobbies = self._lobbies.get(guild_id)
+        if data is None:
+            if lobbies is not None:
+                lobbies.discard(lobby)
+            self._write("DELETE FROM snapshots WHERE guild_id = ? AND lobby = ?", (guild_id, lobby))
+        else:
+            if lobbies is not None:
+                lobbies.add(lobby)
+            self._write("INSERT INTO snapshots VALUES (?, ?, ?) "
+                        "ON CONFLICT (guild_id, lobby) DO UPDATE SET data = excluded.data",
+                        (guild_id, lobby, json.dumps(data, separators=(",", ":"))))
+
+    async def snapshot_lobbies(self, guild_id: int) -> Set[int]:
+        lobbies = self._lobbies.get(guild_id)
+        if lobbies is None:
+            rows = await self._query("SELECT lobby FROM snapshots WHERE guild_id = ?", guild_id)
+            lobbies = self._lobbies[guild_id] = {lobby for lobby, in rows}
+        return set(lobbies)
+
+    async def flush(self):
+        """
+        Commit every queued write in one transaction, they stay queued if it fails
+        """
+        writes, self._writes = self._writes, []
+        if writes:
+            try:
+                await self._call(self._transaction, writes)
+            except Exception:
+                self._writes[:0] = writes
+                raise
+
+    async def run(self):
+        """
+        Flush loop, runs until cancelled, close() writes what is left
+        """
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception:
+                # E.g. the database stayed locked past the busy timeout, retried next time
+                log.exception("Failed to flush writes to %s", self.path)
+
+    async def close(self):
+        await self.release(list(self._owned))
+        await self._call(self._db.close)
+        self._executor.shutdown(wait=False)
+
+    def _write(self, sql: str, params: tuple):
+        self._writes.append((sql, params))
+
+    async def _query(self, sql: str, *params) -> list:
+        await self.flush()
+        return await self._call(lambda: self._db.execute(sql, params).fetchall())
+
+    async def _call(self, function, *args):
+        return await asyncio.get_event_loop().run_in_executor(self._executor, function, *args)
+
+    def _transaction(self, writes: List[Tuple[str, tuple]]):
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            for sql, params in writes:
+                self._db.execute(sql, params)
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        self._db.execute("COMMIT")
+
+    def _executemany(self, sql: str, params: list):
+        if params:
+            self._transaction([(sql, row) for row in params])
+
+    def _acquire(self, guild_id: int, now: float) -> bool:
+        cursor = self._db.execute(
+            "INSERT INTO leases VALUES (?, ?, ?) ON CONFLICT (guild_id) DO UPDATE "
+            "SET owner = excluded.owner, expires = excluded.expires "
+            "WHERE leases.owner = excluded.owner OR leases.expires < ?",
+            (guild_id, self.owner, now + LEASE_TTL, now))
+        return cursor.rowcount == 1
+
+    @staticmethod
+    def _empty() -> dict:
+        return {"role_id": None, "category_id": None, "channel_id": None, "parked_at": None, "lobbies": {}}
+
+    @staticmethod
+    def _resources(rows) -> Dict[int, dict]:
+        guilds = {}
+        for guild_id, lobby, key, value in rows:
+            ids = guilds.get(guild_id)
+            if ids is None:
+                ids = guilds[guild_id] = SQLiteState._empty()
+            if lobby == DEFAULT_LOBBY or key == "category_id":
+                ids[key] = value
+            else:
+                ids["lobbies"].setdefault(str(lobby), dict.fromkeys(SLOT_KEYS))[key] = value
+        return guilds
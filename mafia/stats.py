@@ -0,0 +1,175 @@
+import contextvars
+import logging
+import os
+import time
+from collections import defaultdict
+from typing import Dict, Tuple
+
+# Samples of the stages the current task is in, nested stages all count
+_active: contextvars.ContextVar = contextvars.ContextVar("mafia_stages", default=())
+
+
+def note_api_call():
+    for sample in _active.get():
+        sample.calls += 1
+
+
+def note_rate_limit(seconds: float):
+    for sample in _active.get():
+        sample.rate_limit_wait += seconds
+
+
+class StageTotals:
+    """
+    Accumulated measurements of one stage
+    """
+
+    __slots__ = ("runs", "seconds", "max_seconds", "calls", "rate_limit_wait")
+
+    def __init__(self):
+        self.runs = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.calls = 0
+        self.rate_limit_wait = 0.0
+
+    def add(self, seconds: float, sample: "StageTotals"):
+        self.runs += 1
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.calls += sample.calls
+        self.rate_limit_wait += sample.rate_limit_wait
+
+
+class _Measure:
+    __slots__ = ("stats", "guild_id", "stage", "sample", "started", "token")
+
+    def __init__(self, stats, guild_id, stage):
+        self.stats = stats
+        self.guild_id = guild_id
+        self.stage = stage
+
+    def __enter__(self):
+        self.sample = StageTotals()
+        self.token = _active.set(_active.get() + (self.sample,))
+        self.started = time.perf_counter()
+        return self.sample
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self.started
+        _active.reset(self.token)
+        self.stats.record(self.guild_id, self.stage, seconds, self.sample)
+
+
+class _RateLimitLog(logging.Handler):
+    """
+    discord.py retries 429s itself and only logs the wait, pick it up there
+    """
+
+    def emit(self, record: logging.LogRecord):
+        if "rate limited" in str(record.msg) and record.args:
+            try:
+                note_rate_limit(float(record.args[0]))
+            except (TypeError, ValueError):
+                pass
+
+
+class RoundStats:
+    """
+    Duration, API calls and rate limit waits per round stage and guild
+
+    `measure` marks a stage for the current task and every task it
+    spawns. API calls are counted by wrapping the bot's HTTP client.
+    """
+
+    def __init__(self):
+        self.stages: Dict[str, StageTotals] = defaultdict(StageTotals)
+        self.guilds: Dict[int, Dict[str, StageTotals]] = defaultdict(lambda: defaultdict(StageTotals))
+
+        self._http = None
+        self._request = None
+        self._log_handler = _RateLimitLog()
+
+    def measure(self, guild_id: int, stage: str) -> _Measure:
+        return _Measure(self, guild_id, stage)
+
+    def record(self, guild_id: int, stage: str, seconds: float, sample: StageTotals):
+        self.stages[stage].add(seconds, sample)
+        self.guilds[guild_id][stage].add(seconds, sample)
+
+    def install(self, bot):
+        """
+        Start counting API calls made through the bot
+        """
+        http = getattr(bot, "http", None)
+        if http is not None:
+            request = http.request
+
+            async def counted_request(*args, **kwargs):
+                note_api_call()
+                return await request(*args, **kwargs)
+
+            self._http, self._request = http, request
+            http.request = counted_request
+
+        logging.getLogger("discord.http").addHandler(self._log_handler)
+
+    def uninstall(self):
+        if self._http is not None:
+            self._http.request = self._request
+            self._http = self._request = None
+
+        logging.getLogger("discord.http").removeHandler(self._log_handler)
+
+    def table(self, guild_id: int = None) -> str:
+        """
+        Plain text table of the stages, of one guild if given
+        """
+        stages = self.stages if guild_id is None else self.guilds.get(guild_id, {})
+
+        lines = ["{:<14} {:>6} {:>8} {:>8} {:>9} {:>8}".format("stage", "runs", "avg s", "max s",
+                                                                 "calls/run", "429 s")]
+        for stage, totals in sorted(stages.items()):
+            lines.append("{:<14} {:>6} {:>8.2f} {:>8.2f} {:>9.1f} {:>8.1f}".format(
+                stage, totals.runs, totals.seconds / totals.runs, totals.max_seconds,
+                totals.calls / totals.runs, totals.rate_limit_wait))
+        return "\n".join(lines)
+
+    def prometheus(self, gauges: Dict[str, Tuple[str, float]] = None,
+                   counters: Dict[str, Tuple[str, float]] = None) -> str:
+        """
+        Metrics in the Prometheus text exposition format, plus the given
+        gauges and counters as name -> (description, value)
+        """
+        lines = []
+        metrics = (
+            ("mafia_stage_runs_total", "Times a round stage ran", "runs"),
+            ("mafia_stage_seconds_total", "Time spent in a round stage", "seconds"),
+            ("mafia_stage_api_calls_total", "Discord API calls made in a round stage", "calls"),
+            ("mafia_stage_rate_limit_seconds_total", "Time a round stage waited on rate limits",
+             "rate_limit_wait"),
+        )
+        for name, description, attribute in metrics:
+            lines.append("# HELP {} {}".format(name, description))
+            lines.append("# TYPE {} counter".format(name))
+            for guild_id, stages in self.guilds.items():
+                for stage, totals in stages.items():
+                    lines.append('{}{{guild="{}",stage="{}"}} {}'.format(name, guild_id, stage,
+                                                                         getattr(totals, attribute)))
+
+        for kind, values in (("gauge", gauges), ("counter", counters)):
+            for name, (description, value) in (values or {}).items():
+                lines.append("# HELP {} {}".format(name, description))
+                lines.append("# TYPE {} {}".format(name, kind))
+                lines.append("{} {}".format(name, value))
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path, gauges: Dict[str, Tuple[str, float]] = None,
+                         counters: Dict[str, Tuple[str, float]] = None):
+        """
+        Atomically replace the metrics file at path
+        """
+        temporary = "{}.tmp".format(path)
+        with open(temporary, "w") as file:
+            file.write(self.prometheus(gauges, counters))
+        os.replace(temporary, path)
@@ -0,0 +1,73 @@
+from typing import Dict, Iterable, Tuple
+
+
+class VoteTally:
+    """
+    Incremental vote counter fed by raw reaction events
+
+    Every add or remove is O(1), so totals are ready the moment voting
+    closes and the vote messages never need to be fetched again.
+    Each voter holds at most one vote, their latest reaction counts.
+    """
+
+    def __init__(self, voters: Iterable[int]):
+        self.voters = set(voters)
+        self.options: Dict[Tuple[int, str], int] = {}  # (message id, emoji) -> candidate id
+        self.votes: Dict[int, int] = {}  # voter id -> candidate id
+        self.counts: Dict[int, int] = {}  # candidate id -> votes
+        self.open = True
+
+    def add_option(self, message_id: int, emoji: str, candidate_id: int):
+        self.options[(message_id, emoji)] = candidate_id
+
+    def add(self, message_id: int, user_id: int, emoji: str) -> bool:
+        """
+        Count a reaction, moving the voter's previous vote if they had one
+        """
+        if not self.open or user_id not in self.voters:
+            return False
+
+        candidate = self.options.get((message_id, emoji))
+        if candidate is None:
+            return False
+
+        previous = self.votes.get(user_id)
+        if previous == candidate:
+            return False
+        if previous is not None:
+            self.counts[previous] -= 1
+
+        self.votes[user_id] = candidate
+        self.counts[candidate] = self.counts.get(candidate, 0) + 1
+        return True
+
+    def remove(self, message_id: int, user_id: int, emoji: str) -> bool:
+        """
+        Withdraw a vote, ignored unless the reaction is the voter's current vote
+        """
+        if not self.open:
+            return False
+
+        candidate = self.options.get((message_id, emoji))
+        if candidate is None or self.votes.get(user_id) != candidate:
+            return False
+
+        del self.votes[user_id]
+        self.counts[candidate] -= 1
+        return True
+
+    def on_reaction(self, payload):
+        """
+        Dispatcher handler for raw reaction add/remove events
+        """
+        if payload.event_type == "REACTION_ADD":
+            self.add(payload.message_id, payload.user_id, str(payload.emoji))
+        else:
+            self.remove(payload.message_id, payload.user_id, str(payload.emoji))
+
+    def close(self) -> Dict[int, int]:
+        """
+        Stop accepting votes and return totals per candidate
+        """
+        self.open = False
+        return {candidate: count for candidate, count in self.counts.items() if count > 0}
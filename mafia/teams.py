@@ -0,0 +1,164 @@
+import random
+import time
+from typing import List, Sequence, Tuple
+
+# Largest lobby split exactly per team count, larger ones use local search
+EXACT_PLAYERS = {2: 16, 3: 9, 4: 8}
+# Seconds the local search may spend improving a split
+TIME_LIMIT = 0.05
+
+Split = List[List[int]]
+
+
+def split_teams(scores: Sequence[int], teams: int, mafia: Sequence[bool] = None,
+                time_limit: float = TIME_LIMIT) -> Split:
+    """
+    Player indexes per team, balancing the teams' total score
+
+    Team sizes differ by at most one and so do their mafia counts. The
+    split minimises the gap between the strongest and weakest team,
+    exactly for small lobbies and as far as time_limit allows for large.
+    """
+    if teams < 1:
+        raise ValueError("Need at least one team")
+    if mafia is None:
+        mafia = [False] * len(scores)
+
+    if len(scores) <= EXACT_PLAYERS.get(teams, 8):
+        return _exact(scores, teams, mafia)
+    return _local_search(scores, teams, mafia, time_limit)
+
+
+def spread(scores: Sequence[int], split: Split) -> int:
+    """
+    Gap between the highest and lowest team total
+    """
+    totals = [sum(scores[index] for index in team) for team in split]
+    return max(totals) - min(totals) if totals else 0
+
+
+def _limits(count: int, teams: int) -> Tuple[int, int]:
+    return count // teams, -(-count // teams)
+
+
+def _exact(scores, teams, mafia) -> Split:
+    """
+    Dynamic programming over partial splits, one player at a time
+
+    Splits that only differ by which team is which are the same state,
+    keyed by their sorted (size, mafia, total) team summaries.
+    """
+    players = sorted(range(len(scores)), key=lambda index: -scores[index])
+    size_min, size_max = _limits(len(scores), teams)
+    mafia_min, mafia_max = _limits(sum(map(bool, mafia)), teams)
+
+    # key -> (team summaries, team of each placed player)
+    states = {(): (((0, 0, 0),) * teams, ())}
+    for placed, index in enumerate(players):
+        remaining = len(players) - placed - 1
+        remaining_mafia = sum(1 for other in players[placed + 1:] if mafia[other])
+        next_states = {}
+
+        for summaries, assignment in states.values():
+            for team, (size, mafia_count, total) in enumerate(summaries):
+                size += 1
+                mafia_count += bool(mafia[index])
+                if size > size_max or mafia_count > mafia_max:
+                    continue
+
+                new = summaries[:team] + ((size, mafia_count, total + scores[index]),) + summaries[team + 1:]
+                if sum(max(0, size_min - summary[0]) for summary in new) > remaining:
+                    continue
+                if sum(max(0, mafia_min - summary[1]) for summary in new) > remaining_mafia:
+                    continue
+
+                key = tuple(sorted(new))
+                if key not in next_states:
+                    next_states[key] = (new, assignment + (team,))
+        states = next_states
+
+    summaries, assignment = min(states.values(),
+                                key=lambda state: max(s[2] for s in state[0]) - min(s[2] for s in state[0]))
+    split = [[] for _ in range(teams)]
+    for index, team in zip(players, assignment):
+        split[team].append(index)
+    return split
+
+
+def _local_search(scores, teams, mafia, time_limit) -> Split:
+    """
+    Greedy deal then best swaps between teams, restarted from shuffled
+    splits while time is left, the split with the smallest gap wins
+    """
+    deadline = time.perf_counter() + time_limit
+    size_max = _limits(len(scores), teams)[1]
+
+    # Mafia first so they spread evenly, then strongest to the weakest team with room
+    players = sorted(range(len(scores)), key=lambda index: (not mafia[index], -scores[index]))
+    split = [[] for _ in range(teams)]
+    totals = [0] * teams
+    mafia_counts = [0] * teams
+    for index in players:
+        open_teams = [team for team in range(teams) if len(split[team]) < size_max]
+        team = min(open_teams, key=lambda team: (mafia_counts[team] if mafia[index] else 0, totals[team]))
+        split[team].append(index)
+        totals[team] += scores[index]
+        mafia_counts[team] += bool(mafia[index])
+
+    best_split = _descend(scores, mafia, split, totals, deadline)
+    best_gap = spread(scores, best_split)
+
+    # Equal teams can't get closer than 1 when the total doesn't divide evenly
+    floor = 1 if len(scores) % teams == 0 and sum(scores) % teams else 0
+
+    # Seeded so the same lobby gets the same teams, given the same time
+    generator = random.Random(len(scores))
+    while best_gap > floor and time.perf_counter() < deadline:
+        split = [list(team) for team in best_split]
+        for _ in range(len(scores) // 4 + 1):
+            first, second = generator.sample(range(teams), 2) if teams > 1 else (0, 0)
+            if not split[first] or not split[second]:
+                continue
+            a_pos = generator.randrange(len(split[first]))
+            b_pos = generator.randrange(len(split[second]))
+            if mafia[split[first][a_pos]] == mafia[split[second][b_pos]]:
+                split[first][a_pos], split[second][b_pos] = split[second][b_pos], split[first][a_pos]
+
+        totals = [sum(scores[index] for index in team) for team in split]
+        split = _descend(scores, mafia, split, totals, deadline)
+        gap = spread(scores, split)
+        if gap < best_gap:
+            best_split, best_gap = split, gap
+    return best_split
+
+
+def _descend(scores, mafia, split, totals, deadline) -> Split:
+    teams = len(split)
+
+    # Swapping players of the same kind keeps sizes and mafia counts as they are
+    while time.perf_counter() < deadline:
+        gap = max(totals) - min(totals)
+        best = None
+        for high in range(teams):
+            for low in range(teams):
+                if totals[high] <= totals[low]:
+                    continue
+                for a_pos, a in enumerate(split[high]):
+                    for b_pos, b in enumerate(split[low]):
+                        moved = scores[a] - scores[b]
+                        if moved <= 0 or mafia[a] != mafia[b]:
+                            continue
+                        new_totals = list(totals)
+                        new_totals[high] -= moved
+                        new_totals[low] += moved
+                        new_gap = max(new_totals) - min(new_totals)
+                        if new_gap < gap and (best is None or new_gap < best[0]):
+                            best = (new_gap, high, a_pos, low, b_pos, moved)
+
+        if best is None:
+            break
+        _, high, a_pos, low, b_pos, moved = best
+        split[high][a_pos], split[low][b_pos] = split[low][b_pos], split[high][a_pos]
+        totals[high] -= moved
+        totals[low] += moved
+    return split
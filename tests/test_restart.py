@@ -0,0 +1,87 @@
+"""
+Restart behaviour of the cog against the fake Discord in benchmarks/
+
+    python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "benchmarks"))
+
+import fakediscord  # noqa: E402
+
+fakediscord.install()
+
+from mafia.mafia import HANDOFF, Mafia  # noqa: E402
+from mafia.phase import Phase  # noqa: E402
+from mafia.resources import DEFAULT_LOBBY  # noqa: E402
+from mafia.state import ConfigState  # noqa: E402
+
+FLAG_TITLE = "Respond with the 🏁 when the game is done"
+
+
+async def _until_flag(bot):
+    sent = []
+    bot.message_hooks.append(sent.append)
+    while not any(message.embed is not None and message.embed.title == FLAG_TITLE for message in sent):
+        await asyncio.sleep(0.01)
+    bot.message_hooks.remove(sent.append)
+
+
+async def _restart(bot, cog):
+    """
+    Unload the cog and load a new one without a handoff, like a process restart
+    """
+    cog.cog_unload()
+    bot.cogs.remove(cog)
+    await asyncio.sleep(0.1)
+    delattr(bot, HANDOFF)
+
+    cog = Mafia(bot)
+    await cog.initialize()
+    bot.add_cog(cog)
+    return cog
+
+
+def test_config_lobby_slots_survive_restart():
+    fakediscord.Config._stores.clear()
+
+    async def run():
+        api = fakediscord.FakeAPI(latency=0.001, jitter=0)
+        bot = fakediscord.Bot(api)
+        cog = Mafia(bot)
+        await cog.initialize()
+        bot.add_cog(cog)
+        assert isinstance(cog.state, ConfigState)
+
+        guild = fakediscord.Guild(bot, api)
+        bot.guilds[guild.id] = guild
+        members = [guild.add_member("player{}".format(number)) for number in range(8)]
+
+        def ctx(member):
+            return fakediscord.Context(bot, guild, member, guild.general)
+
+        # Two running lobbies, the second stores its slot key by key in Config
+        for lobby, players in ((DEFAULT_LOBBY, members[:4]), (DEFAULT_LOBBY + 1, members[4:])):
+            await cog.mafia_new(ctx(players[0]))
+            for member in players:
+                await cog.mafia_join(fakediscord.Context(bot, guild, member, guild.general), lobby)
+            started = asyncio.ensure_future(cog.mafia_start(ctx(players[0]), lobby))
+            await _until_flag(bot)
+            assert cog.games.get(guild.id, lobby).phase is Phase.PLAY
+
+        cog = await _restart(bot, cog)
+        await cog.mafia_pool(ctx(members[0]), 3)
+        assert set(await cog.resources.slots(guild)) == {1, 2, 3}
+
+        game = await cog._new_game(ctx(members[0]))
+        assert game is not None and game.lobby_id == 3
+
+        started.cancel()
+        cog.cog_unload()
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())